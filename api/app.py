@@ -0,0 +1,24 @@
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from core.config import settings
+from core.database import async_engine, init_db_async
+from engine.data_manager import DataManager
+from api.endpoints import backtest, data, metrics, strategies
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create tables and shared components once per worker when the app starts
+    """
+    await init_db_async()
+    app.state.data_manager = DataManager()
+    yield
+    del app.state.data_manager
+    await async_engine.dispose()
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
+
+app.include_router(backtest.router, prefix=settings.API_V1_STR)
+app.include_router(data.router, prefix=settings.API_V1_STR)
+app.include_router(metrics.router, prefix=settings.API_V1_STR)
+app.include_router(strategies.router, prefix=settings.API_V1_STR)
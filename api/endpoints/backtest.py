@@ -1,34 +1,49 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import ORJSONResponse
 from typing import List, Optional
 import logging
 import uuid
 import time
+from functools import lru_cache
 from core.models import (
     BacktestRequest,
     BacktestResponse,
     BacktestStatus,
     BacktestResult
 )
-from engine.backtest_engine import BacktestEngine
-from core.database import get_db, BacktestRecord
-from sqlalchemy.orm import Session
+from core.database import get_db, SessionLocal, BacktestRecord
+from core.tasks import celery_app
+from core.cache import redis_client
+from core.config import settings
+from core.artifacts import save_backtest_artifacts, load_backtest_artifacts
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from engine.data_manager import DataManager
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 logger = logging.getLogger(__name__)
 
-# Initialize components
-backtest_engine = BacktestEngine()
-data_manager = DataManager()
+@lru_cache(maxsize=None)
+def get_backtest_engine():
+    """
+    Get the worker's backtest engine, creating its CUDA context on first use
+    """
+    # Imported lazily so the API process never initializes CUDA
+    from engine.backtest_engine import BacktestEngine
+    return BacktestEngine()
 
-# In-memory storage for backtest results (could be moved to Redis in production)
-backtest_results = {}
+@lru_cache(maxsize=None)
+def get_data_manager() -> DataManager:
+    """
+    Get the worker's data manager
+    """
+    return DataManager()
 
 @router.post("/backtest", response_model=BacktestResponse)
 async def create_backtest(
     backtest_request: BacktestRequest,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Submit a new backtesting job
@@ -49,33 +64,31 @@ async def create_backtest(
     # Save initial record to database
     db_record = BacktestRecord(
         id=backtest_id,
-        request=backtest_request.dict(),
+        request=backtest_request.model_dump(mode="json"),
         status="pending",
         results=None
     )
     db.add(db_record)
-    db.commit()
+    await db.commit()
     
-    # Add task to background queue
-    background_tasks.add_task(
-        run_backtest_job,
-        backtest_id,
-        backtest_request
-    )
+    # Hand the job off to a Celery worker
+    run_backtest_job.delay(backtest_id, backtest_request.model_dump(mode="json"))
     
     return response
 
-async def run_backtest_job(backtest_id: str, request: BacktestRequest):
+@celery_app.task(name="run_backtest")
+def run_backtest_job(backtest_id: str, request_data: dict):
     """
-    Run the backtest job in the background
+    Run the backtest job on a Celery worker
     """
     logger.info(f"Starting backtest job: {backtest_id}")
+    request = BacktestRequest.model_validate(request_data)
     
     try:
         start_time = time.time()
         
         # Fetch required data
-        data = data_manager.get_historical_data(
+        data = get_data_manager().get_historical_data(
             symbols=request.data.symbols,
             start_date=request.data.start_date,
             end_date=request.data.end_date,
@@ -83,7 +96,7 @@ async def run_backtest_job(backtest_id: str, request: BacktestRequest):
         )
         
         # Run the backtest
-        results = backtest_engine.run_backtest(
+        results = get_backtest_engine().run_backtest(
             data=data,
             strategy=request.strategy,
             execution_params=request.execution,
@@ -100,16 +113,17 @@ async def run_backtest_job(backtest_id: str, request: BacktestRequest):
             results=results
         )
         
-        # Store results in memory
-        backtest_results[backtest_id] = response
+        # Cache results in Redis so every API worker can serve them
+        redis_client.setex(f"bt:{backtest_id}", settings.BACKTEST_RESULT_TTL, response.model_dump_json())
         
         # Update database record
-        with next(get_db()) as db:
-            record = db.query(BacktestRecord).filter(BacktestRecord.id == backtest_id).first()
+        with SessionLocal() as db:
+            record = db.get(BacktestRecord, backtest_id)
             if record:
                 record.status = "completed"
                 record.execution_time = execution_time
-                record.results = results.dict()
+                record.results = results.model_dump(mode="json", exclude={"trades", "equity_curve"})
+                record.artifact_path = save_backtest_artifacts(backtest_id, results)
                 db.commit()
         
         logger.info(f"Backtest {backtest_id} completed in {execution_time} seconds")
@@ -118,34 +132,42 @@ async def run_backtest_job(backtest_id: str, request: BacktestRequest):
         logger.error(f"Error running backtest {backtest_id}: {str(e)}")
         
         # Update with error status
-        with next(get_db()) as db:
-            record = db.query(BacktestRecord).filter(BacktestRecord.id == backtest_id).first()
+        with SessionLocal() as db:
+            record = db.get(BacktestRecord, backtest_id)
             if record:
                 record.status = "failed"
                 record.error = str(e)
                 db.commit()
 
 @router.get("/backtest/{backtest_id}", response_model=BacktestResponse)
-async def get_backtest_results(backtest_id: str, db: Session = Depends(get_db)):
+async def get_backtest_results(backtest_id: str, db: AsyncSession = Depends(get_db)):
     """
     Retrieve results for a specific backtest
     """
-    # Check in-memory cache first
-    if backtest_id in backtest_results:
-        return backtest_results[backtest_id]
+    # Check Redis cache first, off the event loop since the client is blocking
+    cached = await run_in_threadpool(redis_client.get, f"bt:{backtest_id}")
+    if cached:
+        return BacktestResponse.model_validate_json(cached)
     
     # Otherwise check database
-    record = db.query(BacktestRecord).filter(BacktestRecord.id == backtest_id).first()
+    result = await db.execute(select(BacktestRecord).where(BacktestRecord.id == backtest_id))
+    record = result.scalar_one_or_none()
     
     if not record:
         raise HTTPException(status_code=404, detail=f"Backtest with ID {backtest_id} not found")
     
+    # Only metrics are stored in the database; load trades/equity curve from disk
+    results = record.results
+    if results is not None and record.artifact_path:
+        artifacts = await run_in_threadpool(load_backtest_artifacts, record.artifact_path)
+        results = {**results, **artifacts}
+    
     # Convert DB record to response object
     response = BacktestResponse(
         backtest_id=record.id,
         status=record.status,
         execution_time=record.execution_time or 0,
-        results=record.results
+        results=results
     )
     
     return response
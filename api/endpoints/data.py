@@ -1,22 +1,39 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Depends
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Request
+from fastapi.responses import ORJSONResponse
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional
 import logging
 import pandas as pd
-import io
 from core.models import DataSource, DataUploadResponse
 from core.database import get_db
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from engine.data_manager import DataManager
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 logger = logging.getLogger(__name__)
-data_manager = DataManager()
+
+# Known column types for uploaded OHLCV data, so CSV parsing skips type inference
+OHLCV_DTYPES = {
+    "open": "float32",
+    "high": "float32",
+    "low": "float32",
+    "close": "float32",
+    "volume": "float64",
+    "symbol": "category"
+}
+
+def get_data_manager(request: Request) -> DataManager:
+    """
+    Dependency for the app-wide data manager created at startup
+    """
+    return request.app.state.data_manager
 
 @router.post("/data/upload", response_model=DataUploadResponse)
 async def upload_market_data(
     file: UploadFile = File(...),
     source_name: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    data_manager: DataManager = Depends(get_data_manager)
 ):
     """
     Upload custom market data
@@ -26,31 +43,35 @@ async def upload_market_data(
         raise HTTPException(status_code=400, detail="Only CSV and Parquet files are supported")
     
     try:
-        # Read file content
-        contents = await file.read()
-        
         # Generate source name if not provided
         if not source_name:
             source_name = f"custom_{file.filename.split('.')[0]}"
         
-        # Process data depending on file type
+        # Parse straight from the spooled upload file rather than buffering it in memory
         if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(contents))
+            df = pd.read_csv(file.file, engine="pyarrow", dtype=OHLCV_DTYPES, parse_dates=["date"])
         else:  # parquet
-            df = pd.read_parquet(io.BytesIO(contents))
+            df = pd.read_parquet(file.file, engine="pyarrow")
+            if "symbol" in df.columns:
+                df["symbol"] = df["symbol"].astype("category")
         
         # Validate data format
-        required_columns = ['date', 'symbol', 'open', 'high', 'low', 'close', 'volume']
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        required_columns = {'date', 'symbol', 'open', 'high', 'low', 'close', 'volume'}
+        missing_columns = required_columns - set(df.columns)
         
         if missing_columns:
             raise HTTPException(
                 status_code=400, 
-                detail=f"Missing required columns: {', '.join(missing_columns)}"
+                detail=f"Missing required columns: {', '.join(sorted(missing_columns))}"
             )
         
-        # Store data in the data manager
-        symbols = data_manager.store_custom_data(df, source_name)
+        # Rows are keyed by (source, symbol, date); a repeated row replaces
+        # the earlier one instead of failing the insert
+        df = df.drop_duplicates(['symbol', 'date'], keep='last')
+        
+        # Store data in the data manager; the bulk insert blocks, so it runs
+        # off the event loop
+        symbols = await run_in_threadpool(data_manager.store_custom_data, df, source_name)
         
         return DataUploadResponse(
             source_name=source_name,
@@ -64,7 +85,7 @@ async def upload_market_data(
         raise HTTPException(status_code=500, detail=f"Error processing data: {str(e)}")
 
 @router.get("/data/sources", response_model=List[DataSource])
-async def list_data_sources():
+async def list_data_sources(data_manager: DataManager = Depends(get_data_manager)):
     """
     List available data sources
     """
@@ -72,7 +93,10 @@ async def list_data_sources():
     return sources
 
 @router.get("/data/symbols", response_model=List[str])
-async def list_symbols(source: Optional[str] = None):
+async def list_symbols(
+    source: Optional[str] = None,
+    data_manager: DataManager = Depends(get_data_manager)
+):
     """
     List available symbols, optionally filtered by data source
     """
@@ -1,9 +1,10 @@
 from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
 from typing import List, Dict
 import logging
 from utils.metrics import AVAILABLE_METRICS
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 logger = logging.getLogger(__name__)
 
 @router.get("/metrics", response_model=Dict[str, Dict[str, str]])
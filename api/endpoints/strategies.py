@@ -1,10 +1,10 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
 from typing import List, Dict, Any
 import logging
 from core.models import StrategyTemplate
-from strategies import moving_average, bollinger_bands, momentum, mean_reversion
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 logger = logging.getLogger(__name__)
 
 # Dictionary of available strategy templates
@@ -28,8 +28,7 @@ STRATEGY_TEMPLATES = {
                 "default": 0.01,
                 "description": "Signal threshold to trigger trades"
             }
-        },
-        "module": moving_average
+        }
     },
     "BollingerBands": {
         "name": "BollingerBands",
@@ -45,8 +44,7 @@ STRATEGY_TEMPLATES = {
                 "default": 2.0,
                 "description": "Number of standard deviations for bands"
             }
-        },
-        "module": bollinger_bands
+        }
     },
     "MomentumStrategy": {
         "name": "MomentumStrategy",
@@ -62,8 +60,7 @@ STRATEGY_TEMPLATES = {
                 "default": 0.05,
                 "description": "Threshold for momentum signal"
             }
-        },
-        "module": momentum
+        }
     },
     "MeanReversion": {
         "name": "MeanReversion",
@@ -79,44 +76,35 @@ STRATEGY_TEMPLATES = {
                 "default": 1.5,
                 "description": "Z-score threshold to trigger trades"
             }
-        },
-        "module": mean_reversion
+        }
     }
 }
 
+# Strategy templates are static, so build the response models once at import
+_STRATEGY_LIST = [
+    StrategyTemplate(
+        id=strategy_id,
+        name=strategy_data["name"],
+        description=strategy_data["description"],
+        parameters=strategy_data["parameters"]
+    )
+    for strategy_id, strategy_data in STRATEGY_TEMPLATES.items()
+]
+_STRATEGY_BY_ID = {strategy.id: strategy for strategy in _STRATEGY_LIST}
+
 @router.get("/strategies", response_model=List[StrategyTemplate])
 async def list_strategies():
     """
     List available strategy templates
     """
-    strategy_list = []
-    
-    for strategy_id, strategy_data in STRATEGY_TEMPLATES.items():
-        strategy = StrategyTemplate(
-            id=strategy_id,
-            name=strategy_data["name"],
-            description=strategy_data["description"],
-            parameters=strategy_data["parameters"]
-        )
-        strategy_list.append(strategy)
-    
-    return strategy_list
+    return _STRATEGY_LIST
 
 @router.get("/strategies/{strategy_id}", response_model=StrategyTemplate)
 async def get_strategy(strategy_id: str):
     """
     Get details for a specific strategy template
     """
-    if strategy_id not in STRATEGY_TEMPLATES:
+    if strategy_id not in _STRATEGY_BY_ID:
         raise HTTPException(status_code=404, detail=f"Strategy '{strategy_id}' not found")
     
-    strategy_data = STRATEGY_TEMPLATES[strategy_id]
-    
-    strategy = StrategyTemplate(
-        id=strategy_id,
-        name=strategy_data["name"],
-        description=strategy_data["description"],
-        parameters=strategy_data["parameters"]
-    )
-    
-    return strategy
+    return _STRATEGY_BY_ID[strategy_id]
@@ -0,0 +1,49 @@
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Dict, Any
+from core.config import settings
+from core.models import BacktestResult
+
+def save_backtest_artifacts(backtest_id: str, results: BacktestResult) -> str:
+    """
+    Write the bulky parts of a backtest result (trades and equity curve)
+    to disk and return the artifact directory
+    """
+    artifact_dir = os.path.join(settings.RESULTS_DIR, backtest_id)
+    os.makedirs(artifact_dir, exist_ok=True)
+    
+    if results.trades:
+        trades_table = pa.Table.from_pylist([trade.model_dump() for trade in results.trades])
+        pq.write_table(trades_table, os.path.join(artifact_dir, "trades.parquet"))
+    
+    if results.equity_curve:
+        np.savez_compressed(
+            os.path.join(artifact_dir, "equity.npz"),
+            equity_curve=np.asarray(results.equity_curve, dtype=np.float64)
+        )
+    
+    return artifact_dir
+
+def load_backtest_artifacts(artifact_dir: str) -> Dict[str, Any]:
+    """
+    Load trades and equity curve previously written by save_backtest_artifacts
+    """
+    # Older records hold a path relative to the worker's directory; look
+    # for those under RESULTS_DIR
+    if not os.path.isabs(artifact_dir):
+        artifact_dir = os.path.join(settings.RESULTS_DIR, os.path.basename(artifact_dir))
+    
+    artifacts = {}
+    
+    trades_path = os.path.join(artifact_dir, "trades.parquet")
+    if os.path.exists(trades_path):
+        artifacts["trades"] = pq.read_table(trades_path).to_pylist()
+    
+    equity_path = os.path.join(artifact_dir, "equity.npz")
+    if os.path.exists(equity_path):
+        with np.load(equity_path) as equity:
+            artifacts["equity_curve"] = equity["equity_curve"].tolist()
+    
+    return artifacts
@@ -0,0 +1,8 @@
+import redis
+from core.config import settings
+
+# Shared Redis client for cached backtest results
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+# Same server, returning raw bytes for binary payloads (Parquet)
+redis_binary_client = redis.from_url(settings.REDIS_URL)
@@ -1,6 +1,7 @@
-from sqlalchemy import create_engine, Column, String, Integer, Float, DateTime, JSON, Text, ForeignKey, Table
+from sqlalchemy import create_engine, text, Column, String, Integer, Float, DateTime, JSON, Text, ForeignKey, Table
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 import os
 from datetime import datetime
 from core.config import settings
@@ -11,11 +12,25 @@ from werkzeug.security import generate_password_hash, check_password_hash
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
-    pool_recycle=300
+    pool_recycle=300,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT
+)
+
+# Create async SQLAlchemy engine for the FastAPI endpoints
+async_engine = create_async_engine(
+    settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1),
+    pool_pre_ping=True,
+    pool_recycle=300,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT
 )
 
 # Create session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
 Base = declarative_base()
 
 # We'll use the WatchlistItem class model instead of a Table
@@ -33,9 +48,9 @@ class User(Base, UserMixin):
     created_at = Column(DateTime, default=datetime.utcnow)
     last_login = Column(DateTime, nullable=True)
     
-    # Relationships
-    backtests = relationship("BacktestRecord", back_populates="user")
-    watchlist = relationship("WatchlistItem")
+    # Relationships (lazy="raise" so list queries must opt in via selectinload)
+    backtests = relationship("BacktestRecord", back_populates="user", lazy="raise")
+    watchlist = relationship("WatchlistItem", lazy="raise")
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -59,7 +74,7 @@ class WatchlistItem(Base):
     added_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationship
-    user = relationship("User", back_populates="watchlist")
+    user = relationship("User", back_populates="watchlist", lazy="raise")
     
     def __repr__(self):
         return f'<WatchlistItem {self.symbol} for user {self.user_id}>'
@@ -75,11 +90,12 @@ class BacktestRecord(Base):
     execution_time = Column(Float, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    results = Column(JSON, nullable=True)
+    results = Column(JSON, nullable=True)  # Metrics only; trades/equity curve live in artifact_path
+    artifact_path = Column(String, nullable=True)
     error = Column(Text, nullable=True)
     
     # Relationship
-    user = relationship("User", back_populates="backtests")
+    user = relationship("User", back_populates="backtests", lazy="raise")
 
 class CustomData(Base):
     __tablename__ = "custom_data_sources"
@@ -90,21 +106,50 @@ class CustomData(Base):
     symbols_count = Column(Integer, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class MarketData(Base):
+    __tablename__ = "market_data"
+    
+    source = Column(String, primary_key=True)
+    symbol = Column(String, primary_key=True)
+    date = Column(DateTime, primary_key=True)
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    volume = Column(Float, nullable=True)
+
+# Columns added to tables that already exist in deployed databases, which
+# create_all leaves untouched
+SCHEMA_MIGRATIONS = [
+    "ALTER TABLE backtest_records ADD COLUMN IF NOT EXISTS artifact_path VARCHAR"
+]
+
+def _create_schema(conn):
+    """
+    Create missing tables and apply the column migrations on a connection
+    """
+    Base.metadata.create_all(bind=conn)
+    for statement in SCHEMA_MIGRATIONS:
+        conn.execute(text(statement))
+
 def init_db():
     """
     Initialize database tables
     """
-    Base.metadata.create_all(bind=engine)
+    # Scope the connection so it goes straight back to the pool
+    with engine.begin() as conn:
+        _create_schema(conn)
 
-def get_db():
+async def init_db_async():
     """
-    Dependency for database session
+    Initialize database tables from the async engine (FastAPI startup)
     """
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    async with async_engine.begin() as conn:
+        await conn.run_sync(_create_schema)
 
-# Initialize database on import
-init_db()
+async def get_db():
+    """
+    Dependency for async database session
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, validator
 from typing import List, Dict, Any, Optional
 from datetime import date, datetime
 from enum import Enum
@@ -47,8 +47,8 @@ class BacktestRequest(BaseModel):
 
 class TradeRecord(BaseModel):
     symbol: str
-    entry_date: str
-    exit_date: Optional[str] = None
+    entry_date: datetime
+    exit_date: Optional[datetime] = None
     entry_price: float
     exit_price: Optional[float] = None
     position_size: float
@@ -90,6 +90,8 @@ class BacktestStatus(str, Enum):
     FAILED = "failed"
 
 class BacktestResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
     backtest_id: str
     status: str
     execution_time: float
@@ -120,3 +122,15 @@ class DataUploadResponse(BaseModel):
     symbols: List[str]
     rows: int
     message: str
+
+# Make sure the nested request/response schemas are fully built before the
+# first request rather than on it
+for model in (
+    BacktestRequest,
+    BacktestResponse,
+    BacktestResult,
+    BacktestMetrics,
+    StrategyTemplate,
+    DataUploadResponse
+):
+    model.model_rebuild()
@@ -0,0 +1,15 @@
+from celery import Celery
+from core.config import settings
+
+# Celery application for running backtests outside the API process
+celery_app = Celery(
+    "backtests",
+    broker=settings.REDIS_URL,
+    backend=settings.REDIS_URL,
+    include=["api.endpoints.backtest"]
+)
+
+celery_app.conf.update(
+    task_acks_late=True,  # Re-deliver jobs if a worker dies mid-backtest
+    worker_prefetch_multiplier=1  # Backtests are long-running, don't hoard them
+)
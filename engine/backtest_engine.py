@@ -3,6 +3,7 @@ import pandas as pd
 import numpy as np
 import pycuda.driver as cuda
 import pycuda.autoinit
+import pycuda.gpuarray as gpuarray
 from typing import Dict, List, Any
 from datetime import datetime
 from core.models import (
@@ -19,11 +20,14 @@ from engine.cuda_kernels import (
     momentum_kernel,
     mean_reversion_kernel
 )
+from engine.validation import close_price_dtype
 from utils.metrics import calculate_metrics
 from strategies.base import get_strategy_instance
 
 logger = logging.getLogger(__name__)
 
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
 class BacktestEngine:
     """
     GPU-accelerated backtesting engine
@@ -37,10 +41,23 @@ class BacktestEngine:
         
         # Set up CUDA device and context
         try:
-            self.cuda_device = cuda.Device(0)  # Use the first available GPU
-            self.cuda_context = self.cuda_device.make_context()
+            # Reuse the context the strategy kernels were compiled in
+            self.cuda_device = pycuda.autoinit.device
+            self.cuda_context = pycuda.autoinit.context
             self.device_props = cuda.Device.get_attributes(self.cuda_device)
             
+            # Stream for the batched copies and kernel launch
+            self.stream = cuda.Stream()
+            
+            # Page-locked staging buffers for all symbols of a backtest,
+            # grown on demand and reused across backtests. What goes to and
+            # from the GPU is FP16, unless close prices overflow it; trade
+            # prices come from the FP32 OHLCV
+            self.h_ohlcv = cuda.pagelocked_empty((0, 5), np.float32)
+            self.h_close = {}  # Close prices by upload dtype
+            self.h_signals = cuda.pagelocked_empty(0, np.float16)
+            self.h_positions = cuda.pagelocked_empty(0, np.float16)
+            
             logger.info(f"Using GPU: {self.cuda_device.name()}")
             logger.info(f"CUDA Compute Capability: {self.cuda_device.compute_capability()}")
             logger.info(f"Total GPU Memory: {self.cuda_device.total_memory() / 1024**2} MB")
@@ -49,13 +66,6 @@ class BacktestEngine:
             logger.error(f"Error initializing CUDA: {str(e)}")
             raise RuntimeError(f"Failed to initialize CUDA: {str(e)}")
     
-    def __del__(self):
-        """
-        Clean up CUDA resources
-        """
-        if hasattr(self, 'cuda_context'):
-            self.cuda_context.pop()
-    
     def run_backtest(
         self, 
         data: Dict[str, pd.DataFrame],
@@ -85,41 +95,65 @@ class BacktestEngine:
             # Initialize results containers
             all_positions = {}
             all_trades = []
-            equity_curve = [execution_params.initial_capital]
-            current_equity = execution_params.initial_capital
             
-            # Process each symbol with GPU acceleration
-            for symbol, df in data.items():
+            # Lay symbols out back to back in the pinned buffers
+            offsets = np.concatenate(([0], np.cumsum([len(df) for df in data.values()]))).astype(np.int32)
+            total_bars = int(offsets[-1])
+            max_bars = int(np.diff(offsets).max(initial=0))
+            self._reserve_pinned_buffers(total_bars)
+            
+            for i, (symbol, df) in enumerate(data.items()):
                 logger.debug(f"Processing symbol: {symbol}")
+                start, end = offsets[i], offsets[i + 1]
                 
                 # Prepare data for GPU processing
-                dates = df.index.values
-                ohlcv = np.vstack([
-                    df['open'].values,
-                    df['high'].values,
-                    df['low'].values,
-                    df['close'].values,
-                    df['volume'].values
-                ]).T.astype(np.float32)
+                ohlcv = self.h_ohlcv[start:end]
+                for col_idx, column in enumerate(OHLCV_COLUMNS):
+                    ohlcv[:, col_idx] = df[column].values
+            
+            # Run the strategy for every symbol in a single kernel launch
+            if max_bars > 0:
+                # The whole batch shares one close buffer, so a single symbol
+                # beyond the FP16 range sends every price up as FP32
+                close = self.h_ohlcv[:total_bars, 3]
+                close_dtype = close_price_dtype(close)
+                if close_dtype != np.float16:
+                    logger.info(f"Close prices exceed the FP16 range, running {strategy.name} on FP32 prices")
+                h_close = self._close_buffer(close_dtype, total_bars)
+                h_close[:] = close
                 
-                # Run the strategy on GPU
-                signals, positions = strategy_instance.execute_on_gpu(
-                    ohlcv, 
-                    strategy.parameters
+                d_close = gpuarray.to_gpu_async(h_close, stream=self.stream)
+                d_offsets = gpuarray.to_gpu_async(offsets, stream=self.stream)
+                d_signals, d_positions = strategy_instance.launch_on_gpu(
+                    d_close,
+                    d_offsets,
+                    max_bars,
+                    strategy.parameters,
+                    stream=self.stream
                 )
+                d_signals.get_async(self.stream, self.h_signals[:total_bars])
+                d_positions.get_async(self.stream, self.h_positions[:total_bars])
+                self.stream.synchronize()
+            
+            for i, (symbol, df) in enumerate(data.items()):
+                start, end = offsets[i], offsets[i + 1]
                 
                 # Track positions
+                positions = self.h_positions[start:end].astype(np.float32)
                 all_positions[symbol] = positions
                 
                 # Generate trades from positions
-                trades = self._generate_trades(symbol, dates, ohlcv, positions)
+                trades = self._generate_trades(symbol, df.index.values, self.h_ohlcv[start:end], positions)
                 all_trades.extend(trades)
-                
-                # Update equity curve (simplified)
-                for trade in trades:
-                    if trade.pnl is not None:
-                        current_equity += trade.pnl
-                        equity_curve.append(float(current_equity))
+            
+            # Build equity curve (simplified) from cumulative trade P&L
+            pnls = np.fromiter(
+                (trade.pnl for trade in all_trades if trade.pnl is not None),
+                dtype=np.float64
+            )
+            equity_curve = np.cumsum(
+                np.concatenate(([execution_params.initial_capital], pnls))
+            ).tolist()
             
             # Calculate performance metrics
             overall_metrics, symbol_metrics = calculate_metrics(
@@ -145,6 +179,29 @@ class BacktestEngine:
             logger.error(f"Error running backtest: {str(e)}")
             raise RuntimeError(f"Backtest execution failed: {str(e)}")
     
+    def _reserve_pinned_buffers(self, total_bars: int):
+        """
+        Make sure the pinned staging buffers can hold total_bars rows
+        """
+        if self.h_ohlcv.shape[0] >= total_bars:
+            return
+        
+        self.h_ohlcv = cuda.pagelocked_empty((total_bars, 5), np.float32)
+        self.h_signals = cuda.pagelocked_empty(total_bars, np.float16)
+        self.h_positions = cuda.pagelocked_empty(total_bars, np.float16)
+    
+    def _close_buffer(self, dtype: np.dtype, total_bars: int) -> np.ndarray:
+        """
+        Pinned staging buffer for total_bars close prices of the given dtype.
+        The FP32 one is only allocated once a batch needs it.
+        """
+        h_close = self.h_close.get(dtype)
+        if h_close is None or h_close.shape[0] < total_bars:
+            h_close = cuda.pagelocked_empty(total_bars, dtype)
+            self.h_close[dtype] = h_close
+        
+        return h_close[:total_bars]
+    
     def _generate_trades(
         self, 
         symbol: str, 
@@ -155,42 +212,45 @@ class BacktestEngine:
         """
         Generate trade records from position signals
         """
-        trades = []
-        in_position = False
-        entry_date = None
-        entry_price = None
-        entry_idx = None
+        n_bars = len(positions)
         position_size = 100  # Simplified for this example
         
-        for i in range(1, len(positions)):
-            # New position
-            if not in_position and positions[i] != 0:
-                in_position = True
-                entry_idx = i
-                entry_date = str(dates[i])
-                entry_price = float(ohlcv[i, 3])  # Close price
-            
-            # Exit position
-            elif in_position and (positions[i] == 0 or i == len(positions) - 1):
-                in_position = False
-                exit_date = str(dates[i])
-                exit_price = float(ohlcv[i, 3])  # Close price
-                
-                # Calculate P&L
-                pnl = (exit_price - entry_price) * position_size
-                if positions[entry_idx] < 0:  # Short position
-                    pnl = -pnl
-                
-                # Create trade record
-                trade = TradeRecord(
-                    symbol=symbol,
-                    entry_date=entry_date,
-                    exit_date=exit_date,
-                    entry_price=entry_price,
-                    exit_price=exit_price,
-                    position_size=position_size,
-                    pnl=float(pnl)
-                )
-                trades.append(trade)
+        if n_bars < 2:
+            return []
+        
+        # A trade spans a run of non-zero positions (ignoring the first bar),
+        # closing on the next flat bar or the last bar
+        active = (positions[1:] != 0).astype(np.int8)
+        edges = np.diff(np.concatenate(([0], active, [0])))
+        entries = np.flatnonzero(edges == 1) + 1
+        exits = np.minimum(np.flatnonzero(edges == -1) + 1, n_bars - 1)
+        
+        # A position opened on the final bar is never closed
+        closed = entries < exits
+        entries = entries[closed]
+        exits = exits[closed]
+        
+        entry_prices = ohlcv[entries, 3].astype(np.float64)  # Close price
+        exit_prices = ohlcv[exits, 3].astype(np.float64)  # Close price
         
-        return trades
+        # Calculate P&L, flipping the sign for short positions
+        direction = np.where(positions[entries] < 0, -1.0, 1.0)
+        pnls = (exit_prices - entry_prices) * position_size * direction
+        
+        # Only convert the bars that open or close a trade to datetimes
+        entry_dates = pd.DatetimeIndex(dates[entries]).to_pydatetime()
+        exit_dates = pd.DatetimeIndex(dates[exits]).to_pydatetime()
+        
+        return [
+            TradeRecord(
+                symbol=symbol,
+                entry_date=entry_date,
+                exit_date=exit_date,
+                entry_price=float(entry_price),
+                exit_price=float(exit_price),
+                position_size=position_size,
+                pnl=float(pnl)
+            )
+            for entry_date, exit_date, entry_price, exit_price, pnl
+            in zip(entry_dates, exit_dates, entry_prices, exit_prices, pnls)
+        ]
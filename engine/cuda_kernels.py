@@ -1,245 +1,442 @@
+import os
+import hashlib
 import numpy as np
 import pycuda.driver as cuda
 import pycuda.autoinit
-from pycuda.compiler import SourceModule
+import pycuda.gpuarray as gpuarray
+from pycuda import compiler
+from pycuda.scan import InclusiveScanKernel
+from typing import Dict, Optional, Tuple
 import logging
+from core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Compiled kernels are kept on disk so only the first process to see a
+# given source on a given GPU architecture pays for nvcc
+CUBIN_DIR = os.path.join(settings.DATA_CACHE_DIR, "cubin")
+
+# Prices and outputs are FP16 on the device, except for batches whose prices
+# overflow FP16. Window sums come from FP64 prefix sums of the prices, so
+# each bar costs O(1) regardless of window.
+# cuda_fp16.h is C++, so the kernels are wrapped in extern "C" by hand
+KERNEL_PREAMBLE = """
+    #include <cuda_fp16.h>
+    extern "C" {
+"""
+KERNEL_EPILOGUE = """
+    }
+"""
+
+# Close prices go up as FP16 unless a batch holds prices beyond its range,
+# in which case they go up as FP32. Kernels reading them are built for
+# both, reading prices through price_t and load_price
+PRICE_TYPEDEFS = {
+    np.dtype(np.float16): """
+    typedef __half price_t;
+    __device__ __forceinline__ float load_price(price_t p) { return __half2float(p); }
+""",
+    np.dtype(np.float32): """
+    typedef float price_t;
+    __device__ __forceinline__ float load_price(price_t p) { return p; }
+"""
+}
+
+def load_module(source: str) -> cuda.Module:
+    """
+    Load a kernel module from the cubin cache, compiling it on a miss.
+    Entries are keyed by the source, the device architecture and the CUDA
+    version, so a driver or hardware change never loads a stale cubin.
+    """
+    major, minor = cuda.Context.get_device().compute_capability()
+    arch = f"sm_{major}{minor}"
+    cuda_version = ".".join(str(part) for part in cuda.get_version())
+    key = hashlib.sha1(f"{arch}\0{cuda_version}\0{source}".encode()).hexdigest()
+    cubin_path = os.path.join(CUBIN_DIR, f"{key}.cubin")
+    
+    if os.path.exists(cubin_path):
+        with open(cubin_path, "rb") as f:
+            return cuda.module_from_buffer(f.read())
+    
+    logger.info(f"Compiling CUDA module for {arch}")
+    cubin = compiler.compile(source, no_extern_c=True, arch=arch, cache_dir=False)
+    
+    # Write under a temporary name so other workers never load a partial cubin
+    tmp_path = f"{cubin_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CUBIN_DIR, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(cubin)
+        os.replace(tmp_path, cubin_path)
+    except OSError as e:
+        logger.warning(f"Could not cache compiled CUDA module: {str(e)}")
+    
+    return cuda.module_from_buffer(cubin)
+
+def load_price_modules(source: str) -> Dict[np.dtype, cuda.Module]:
+    """
+    Load a kernel module reading close prices, once per close price dtype
+    """
+    return {
+        dtype: load_module(KERNEL_PREAMBLE + typedef + source + KERNEL_EPILOGUE)
+        for dtype, typedef in PRICE_TYPEDEFS.items()
+    }
+
+# CUDA kernel widening close prices into the inputs of the prefix sums
+close_moments_kernel = load_price_modules("""
+    __global__ void close_moments(
+        const price_t * __restrict__ close, // Close prices for all symbols, back to back
+        int n,               // Total number of bars
+        double * __restrict__ x,           // Output close prices
+        double * __restrict__ x_sq         // Output squared close prices (may be NULL)
+    ) {
+        int idx = blockIdx.x * blockDim.x + threadIdx.x;
+        
+        if (idx >= n) return;
+        
+        double value = load_price(close[idx]);
+        x[idx] = value;
+        if (x_sq) x_sq[idx] = value * value;
+    }
+""")
+close_moments = {
+    dtype: module.get_function("close_moments")
+    for dtype, module in close_moments_kernel.items()
+}
+
+prefix_sum_kernel = InclusiveScanKernel(np.float64, "a+b")
+
+def window_prefix_sums(
+    d_close: gpuarray.GPUArray,
+    squares: bool = True,
+    stream: Optional[cuda.Stream] = None
+) -> Tuple[gpuarray.GPUArray, Optional[gpuarray.GPUArray]]:
+    """
+    Inclusive prefix sums of close prices (and their squares) over the whole
+    batch. Within a symbol, the sum of the window ending at bar i is
+    csum[i] - csum[i - window]; earlier symbols cancel out.
+    """
+    n = d_close.size
+    d_csum = gpuarray.empty(n, dtype=np.float64)
+    d_csum_sq = gpuarray.empty(n, dtype=np.float64) if squares else None
+    
+    block_size = 256
+    close_moments[d_close.dtype](
+        d_close.gpudata,
+        np.int32(n),
+        d_csum.gpudata,
+        d_csum_sq.gpudata if squares else np.intp(0),
+        block=(block_size, 1, 1),
+        grid=((n + block_size - 1) // block_size, 1),
+        stream=stream
+    )
+    
+    prefix_sum_kernel(d_csum, d_csum, stream=stream)
+    if squares:
+        prefix_sum_kernel(d_csum_sq, d_csum_sq, stream=stream)
+    
+    return d_csum, d_csum_sq
+
+# CUDA kernels turning signals into positions. A position holds the last
+# non-zero signal of its symbol, which is a forward fill: mark the bars a
+# position is taken from, carry the latest mark forward with a max scan,
+# then gather the signal at that mark
+fill_positions_kernel = load_module(KERNEL_PREAMBLE + """
+    __global__ void mark_fill_sources(
+        const __half * __restrict__ signals, // Signals for all symbols, back to back
+        const int * __restrict__ offsets,    // Start of each symbol's bars [n_symbols + 1]
+        int * __restrict__ sources           // Output bar index to take the position from, or -1
+    ) {
+        // One row of blocks per symbol
+        int start = offsets[blockIdx.y];
+        int n_bars = offsets[blockIdx.y + 1] - start;
+        int idx = blockIdx.x * blockDim.x + threadIdx.x;
+        
+        if (idx >= n_bars) return;
+        
+        // A symbol's first bar is flat and stops earlier symbols carrying over
+        bool is_source = idx == 0 || __half2float(signals[start + idx]) != 0.0f;
+        sources[start + idx] = is_source ? start + idx : -1;
+    }
+    
+    __global__ void gather_positions(
+        const __half * __restrict__ signals, // Signals for all symbols, back to back
+        const int * __restrict__ sources,    // Latest source bar at or before each bar
+        int n,                 // Total number of bars
+        __half * __restrict__ positions      // Output positions [-1, 0, 1]
+    ) {
+        int idx = blockIdx.x * blockDim.x + threadIdx.x;
+        
+        if (idx >= n) return;
+        
+        positions[idx] = signals[sources[idx]];
+    }
+""" + KERNEL_EPILOGUE)
+mark_fill_sources = fill_positions_kernel.get_function("mark_fill_sources")
+gather_positions = fill_positions_kernel.get_function("gather_positions")
+
+latest_source_kernel = InclusiveScanKernel(np.int32, "max(a, b)")
+
+def fill_positions(
+    d_signals: gpuarray.GPUArray,
+    d_offsets: gpuarray.GPUArray,
+    max_bars: int,
+    stream: Optional[cuda.Stream] = None
+) -> gpuarray.GPUArray:
+    """
+    Positions for a batch of signals: each bar holds the last non-zero
+    signal of its symbol, or 0 before the first one
+    """
+    n = d_signals.size
+    n_symbols = d_offsets.size - 1
+    d_sources = gpuarray.empty(n, dtype=np.int32)
+    d_positions = gpuarray.empty(n, dtype=np.float16)
+    
+    block_size = 256
+    mark_fill_sources(
+        d_signals.gpudata,
+        d_offsets.gpudata,
+        d_sources.gpudata,
+        block=(block_size, 1, 1),
+        grid=((max_bars + block_size - 1) // block_size, n_symbols),
+        stream=stream
+    )
+    
+    latest_source_kernel(d_sources, d_sources, stream=stream)
+    
+    gather_positions(
+        d_signals.gpudata,
+        d_sources.gpudata,
+        np.int32(n),
+        d_positions.gpudata,
+        block=(block_size, 1, 1),
+        grid=((n + block_size - 1) // block_size, 1),
+        stream=stream
+    )
+    
+    return d_positions
+
 # CUDA kernel for Moving Average Crossover strategy
-moving_average_kernel = SourceModule("""
+moving_average_kernel = load_price_modules("""
     __global__ void moving_average_crossover(
-        float *ohlcv,        // Input OHLCV data [n_bars, 5]
-        int n_bars,          // Number of bars
+        const price_t * __restrict__ close, // Close prices for all symbols, back to back
+        const int * __restrict__ offsets, // Start of each symbol's bars [n_symbols + 1]
+        const double * __restrict__ csum, // Prefix sums of close prices
         int short_window,    // Short moving average window
         int long_window,     // Long moving average window
         float signal_threshold, // Signal threshold
-        float *signals,      // Output signals [-1, 0, 1]
-        float *positions     // Output positions [-1, 0, 1]
+        __half * __restrict__ signals      // Output signals [-1, 0, 1]
     ) {
+        // One row of blocks per symbol
+        int start = offsets[blockIdx.y];
+        int n_bars = offsets[blockIdx.y + 1] - start;
         int idx = blockIdx.x * blockDim.x + threadIdx.x;
         
         if (idx >= n_bars) return;
         
-        // Initialize signals and positions
-        signals[idx] = 0.0f;
-        positions[idx] = 0.0f;
+        close += start;
+        csum += start;
+        signals += start;
+        
+        // Initialize signals
+        signals[idx] = __float2half(0.0f);
         
         // Need at least long_window bars to calculate signals
         if (idx < long_window) return;
         
-        // Calculate short moving average
-        float short_ma = 0.0f;
-        for (int i = 0; i < short_window; i++) {
-            short_ma += ohlcv[idx - i];
-        }
-        short_ma /= short_window;
-        
-        // Calculate long moving average
-        float long_ma = 0.0f;
-        for (int i = 0; i < long_window; i++) {
-            long_ma += ohlcv[idx - i];
-        }
-        long_ma /= long_window;
+        // Calculate short and long moving averages from the prefix sums
+        float short_ma = (float)((csum[idx] - csum[idx - short_window]) / short_window);
+        float long_ma = (float)((csum[idx] - csum[idx - long_window]) / long_window);
         
         // Generate signal based on crossover
         float diff = short_ma - long_ma;
         
+        float signal = 0.0f;
         if (diff > signal_threshold) {
-            signals[idx] = 1.0f;  // Buy signal
+            signal = 1.0f;  // Buy signal
         } else if (diff < -signal_threshold) {
-            signals[idx] = -1.0f; // Sell signal
+            signal = -1.0f; // Sell signal
         }
         
-        // Set position based on signal
-        if (idx > 0) {
-            if (signals[idx] != 0.0f) {
-                positions[idx] = signals[idx];
-            } else {
-                positions[idx] = positions[idx - 1];
-            }
-        }
+        signals[idx] = __float2half(signal);
     }
 """)
 
 # CUDA kernel for Bollinger Bands strategy
-bollinger_bands_kernel = SourceModule("""
+bollinger_bands_kernel = load_price_modules("""
     __global__ void bollinger_bands(
-        float *ohlcv,       // Input OHLCV data [n_bars, 5]
-        int n_bars,         // Number of bars
+        const price_t * __restrict__ close, // Close prices for all symbols, back to back
+        const int * __restrict__ offsets, // Start of each symbol's bars [n_symbols + 1]
+        const double * __restrict__ csum, // Prefix sums of close prices
+        const double * __restrict__ csum_sq, // Prefix sums of squared close prices
         int window,         // Window size for moving average
         float num_std,      // Number of standard deviations
-        float *signals,     // Output signals
-        float *positions    // Output positions
+        __half * __restrict__ signals     // Output signals
     ) {
+        // One row of blocks per symbol
+        int start = offsets[blockIdx.y];
+        int n_bars = offsets[blockIdx.y + 1] - start;
         int idx = blockIdx.x * blockDim.x + threadIdx.x;
         
         if (idx >= n_bars) return;
         
+        close += start;
+        csum += start;
+        csum_sq += start;
+        signals += start;
+        
         // Initialize
-        signals[idx] = 0.0f;
-        positions[idx] = 0.0f;
+        signals[idx] = __float2half(0.0f);
         
         // Need at least window bars to calculate
         if (idx < window) return;
         
-        // Calculate moving average
-        float ma = 0.0f;
-        for (int i = 0; i < window; i++) {
-            ma += ohlcv[idx - i];
-        }
-        ma /= window;
-        
-        // Calculate standard deviation
-        float variance = 0.0f;
-        for (int i = 0; i < window; i++) {
-            float diff = ohlcv[idx - i] - ma;
-            variance += diff * diff;
-        }
-        variance /= window;
-        float std_dev = sqrt(variance);
+        // Calculate moving average and standard deviation from the prefix sums
+        double mean_d = (csum[idx] - csum[idx - window]) / window;
+        double variance = (csum_sq[idx] - csum_sq[idx - window]) / window - mean_d * mean_d;
+        float ma = (float)mean_d;
+        float std_dev = (float)sqrt(fmax(variance, 0.0));
         
         // Calculate Bollinger Bands
         float upper_band = ma + num_std * std_dev;
         float lower_band = ma - num_std * std_dev;
         
         // Generate signals
-        float current_price = ohlcv[idx];
+        float current_price = load_price(close[idx]);
         
+        float signal = 0.0f;
         if (current_price > upper_band) {
-            signals[idx] = -1.0f;  // Sell signal (overbought)
+            signal = -1.0f;  // Sell signal (overbought)
         } else if (current_price < lower_band) {
-            signals[idx] = 1.0f;   // Buy signal (oversold)
+            signal = 1.0f;   // Buy signal (oversold)
         }
         
-        // Set position based on signal
-        if (idx > 0) {
-            if (signals[idx] != 0.0f) {
-                positions[idx] = signals[idx];
-            } else {
-                positions[idx] = positions[idx - 1];
-            }
-        }
+        signals[idx] = __float2half(signal);
     }
 """)
 
 # CUDA kernel for Momentum strategy
-momentum_kernel = SourceModule("""
+momentum_kernel = load_price_modules("""
     __global__ void momentum_strategy(
-        float *ohlcv,           // Input OHLCV data [n_bars, 5]
-        int n_bars,             // Number of bars
+        const price_t * __restrict__ close,   // Close prices for all symbols, back to back
+        const int * __restrict__ offsets,     // Start of each symbol's bars [n_symbols + 1]
         int momentum_window,    // Window for momentum calculation
         float threshold,        // Signal threshold
-        float *signals,         // Output signals
-        float *positions        // Output positions
+        __half * __restrict__ signals         // Output signals
     ) {
+        // One row of blocks per symbol
+        int start = offsets[blockIdx.y];
+        int n_bars = offsets[blockIdx.y + 1] - start;
         int idx = blockIdx.x * blockDim.x + threadIdx.x;
         
         if (idx >= n_bars) return;
         
+        close += start;
+        signals += start;
+        
         // Initialize
-        signals[idx] = 0.0f;
-        positions[idx] = 0.0f;
+        signals[idx] = __float2half(0.0f);
         
         // Need at least momentum_window bars
         if (idx < momentum_window) return;
         
         // Calculate momentum (price change over window)
-        float current_price = ohlcv[idx];
-        float past_price = ohlcv[idx - momentum_window];
+        float current_price = load_price(close[idx]);
+        float past_price = load_price(close[idx - momentum_window]);
         
         float momentum = (current_price - past_price) / past_price;
         
         // Generate signal based on momentum
+        float signal = 0.0f;
         if (momentum > threshold) {
-            signals[idx] = 1.0f;  // Buy signal
+            signal = 1.0f;  // Buy signal
         } else if (momentum < -threshold) {
-            signals[idx] = -1.0f; // Sell signal
+            signal = -1.0f; // Sell signal
         }
         
-        // Set position based on signal
-        if (idx > 0) {
-            if (signals[idx] != 0.0f) {
-                positions[idx] = signals[idx];
-            } else {
-                positions[idx] = positions[idx - 1];
-            }
-        }
+        signals[idx] = __float2half(signal);
     }
 """)
 
 # CUDA kernel for Mean Reversion strategy
-mean_reversion_kernel = SourceModule("""
+mean_reversion_kernel = load_price_modules("""
     __global__ void mean_reversion(
-        float *ohlcv,        // Input OHLCV data [n_bars, 5]
-        int n_bars,          // Number of bars
+        const price_t * __restrict__ close, // Close prices for all symbols, back to back
+        const int * __restrict__ offsets,  // Start of each symbol's bars [n_symbols + 1]
+        const double * __restrict__ csum,  // Prefix sums of close prices
+        const double * __restrict__ csum_sq, // Prefix sums of squared close prices
         int window,          // Window for mean calculation
         float z_threshold,   // Z-score threshold for signals
-        float *signals,      // Output signals
-        float *positions     // Output positions
+        __half * __restrict__ signals      // Output signals
     ) {
+        // One row of blocks per symbol
+        int start = offsets[blockIdx.y];
+        int n_bars = offsets[blockIdx.y + 1] - start;
         int idx = blockIdx.x * blockDim.x + threadIdx.x;
         
         if (idx >= n_bars) return;
         
+        close += start;
+        csum += start;
+        csum_sq += start;
+        signals += start;
+        
         // Initialize
-        signals[idx] = 0.0f;
-        positions[idx] = 0.0f;
+        signals[idx] = __float2half(0.0f);
         
         // Need at least window bars
         if (idx < window) return;
         
-        // Calculate mean
-        float mean = 0.0f;
-        for (int i = 0; i < window; i++) {
-            mean += ohlcv[idx - i];
-        }
-        mean /= window;
-        
-        // Calculate standard deviation
-        float variance = 0.0f;
-        for (int i = 0; i < window; i++) {
-            float diff = ohlcv[idx - i] - mean;
-            variance += diff * diff;
-        }
-        variance /= window;
-        float std_dev = sqrt(variance);
+        // Calculate mean and standard deviation from the prefix sums
+        double mean_d = (csum[idx] - csum[idx - window]) / window;
+        double variance = (csum_sq[idx] - csum_sq[idx - window]) / window - mean_d * mean_d;
+        float mean = (float)mean_d;
+        float std_dev = (float)sqrt(fmax(variance, 0.0));
         
         if (std_dev == 0.0f) return;  // Avoid division by zero
         
         // Calculate z-score
-        float current_price = ohlcv[idx];
+        float current_price = load_price(close[idx]);
         float z_score = (current_price - mean) / std_dev;
         
         // Generate signals based on z-score
+        float signal = 0.0f;
         if (z_score > z_threshold) {
-            signals[idx] = -1.0f;  // Sell signal (price above mean)
+            signal = -1.0f;  // Sell signal (price above mean)
         } else if (z_score < -z_threshold) {
-            signals[idx] = 1.0f;   // Buy signal (price below mean)
+            signal = 1.0f;   // Buy signal (price below mean)
         }
         
-        // Set position based on signal
-        if (idx > 0) {
-            if (signals[idx] != 0.0f) {
-                positions[idx] = signals[idx];
-            } else {
-                positions[idx] = positions[idx - 1];
-            }
-        }
+        signals[idx] = __float2half(signal);
     }
 """)
 
+# Signal kernel of each strategy by close price dtype, looked up once at import
+STRATEGY_KERNELS = {
+    "MovingAverageCrossover": {
+        dtype: module.get_function("moving_average_crossover")
+        for dtype, module in moving_average_kernel.items()
+    },
+    "BollingerBands": {
+        dtype: module.get_function("bollinger_bands")
+        for dtype, module in bollinger_bands_kernel.items()
+    },
+    "MomentumStrategy": {
+        dtype: module.get_function("momentum_strategy")
+        for dtype, module in momentum_kernel.items()
+    },
+    "MeanReversion": {
+        dtype: module.get_function("mean_reversion")
+        for dtype, module in mean_reversion_kernel.items()
+    }
+}
+
 def get_kernel_function(strategy_name):
     """
-    Get the appropriate CUDA kernel function for a strategy
+    Get the CUDA signal kernel functions of a strategy by close price dtype,
+    together with the function that turns its signals into positions
     """
-    if strategy_name == "MovingAverageCrossover":
-        return moving_average_kernel.get_function("moving_average_crossover")
-    elif strategy_name == "BollingerBands":
-        return bollinger_bands_kernel.get_function("bollinger_bands")
-    elif strategy_name == "MomentumStrategy":
-        return momentum_kernel.get_function("momentum_strategy")
-    elif strategy_name == "MeanReversion":
-        return mean_reversion_kernel.get_function("mean_reversion")
-    else:
+    if strategy_name not in STRATEGY_KERNELS:
         raise ValueError(f"Unknown strategy: {strategy_name}")
+    
+    return STRATEGY_KERNELS[strategy_name], fill_positions
@@ -2,9 +2,26 @@ import pandas as pd
 import numpy as np
 import logging
 from typing import Dict, List, Optional, Tuple
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 import os
+import io
+import zlib
+import shutil
+from collections import OrderedDict, defaultdict
+import json
+import hashlib
+import redis
 from core.models import DataSource
+from core.config import settings
+from core.cache import redis_binary_client
+from sqlalchemy import delete, select
+from core.database import engine, MarketData
+
+# Column order of the market_data table, used for bulk loads
+MARKET_DATA_COLUMNS = ["source", "date", "symbol", "open", "high", "low", "close", "volume"]
+
+# Price columns are cached as float32, the precision the GPU path uses
+PRICE_COLUMNS = ["open", "high", "low", "close"]
 
 logger = logging.getLogger(__name__)
 
@@ -17,9 +34,16 @@ class DataManager:
         """
         Initialize the data manager
         """
-        self.data_cache = {}
+        # Cached series are stored column-wise as contiguous NumPy arrays
+        # (open/high/low/close float32, volume uint32, dates datetime64).
+        # At most DATA_CACHE_SIZE are held; least recently used ones spill to
+        # DATA_CACHE_DIR and are memory-mapped back in on the next hit.
+        self.data_cache = OrderedDict()
         self.custom_data_sources = {}
         
+        # Symbols seen per data source, kept alongside data_cache
+        self.source_symbols = defaultdict(set)
+        
         # Default data source - should be populated with real data in production
         self.default_symbols = [
             "AAPL", "MSFT", "GOOG", "AMZN", "META", 
@@ -50,27 +74,240 @@ class DataManager:
         logger.info(f"Loading data for {len(symbols)} symbols from {start_date} to {end_date}")
         
         result = {}
+        missing_symbols = []
+        generation = self._source_generation(data_source)
         
         for symbol in symbols:
             # Check cache first
-            cache_key = f"{symbol}_{data_source}_{timeframe}_{start_date}_{end_date}"
+            cache_key = self._series_key(symbol, data_source, generation, timeframe, start_date, end_date)
             
-            if cache_key in self.data_cache:
+            columns = self._get_cached_series(cache_key, symbol, data_source)
+            if columns is not None:
                 logger.debug(f"Using cached data for {symbol}")
-                result[symbol] = self.data_cache[cache_key]
-                continue
-            
+                result[symbol] = self._to_frame(symbol, columns)
+            else:
+                missing_symbols.append(symbol)
+        
+        if not missing_symbols:
+            return result
+        
+        # Another worker may already have loaded this exact window
+        redis_key = self._historical_data_key(symbols, start_date, end_date, timeframe, data_source, generation)
+        cached = self._read_cached_frames(redis_key)
+        if cached is not None:
+            for symbol, df in cached.items():
+                cache_key = self._series_key(symbol, data_source, generation, timeframe, start_date, end_date)
+                self._cache_series(cache_key, symbol, data_source, self._to_columns(df))
+            return cached
+        
+        if data_source == "default":
             # Generate synthetic data for demo purposes
             # In production, this would be replaced with real data fetching logic
-            df = self._generate_synthetic_data(symbol, start_date, end_date, timeframe)
+            date_range = self._synthetic_date_range(start_date, end_date, timeframe)
+            loaded = self._generate_synthetic_batch(missing_symbols, date_range)
+        else:
+            # Fetch all uploaded symbols in one query
+            loaded = {
+                symbol: self._to_columns(df)
+                for symbol, df in self._load_market_data(missing_symbols, start_date, end_date, data_source).items()
+            }
             
+            not_found = set(missing_symbols) - set(loaded)
+            if not_found:
+                logger.warning(f"No data found in source {data_source} for symbols: {not_found}")
+        
+        for symbol, columns in loaded.items():
             # Cache the data
-            self.data_cache[cache_key] = df
+            cache_key = self._series_key(symbol, data_source, generation, timeframe, start_date, end_date)
+            self._cache_series(cache_key, symbol, data_source, columns)
             
-            result[symbol] = df
+            result[symbol] = self._to_frame(symbol, columns)
+        
+        self._write_cached_frames(redis_key, result)
         
         return result
     
+    def _series_key(
+        self,
+        symbol: str,
+        source_name: str,
+        generation: int,
+        timeframe: str,
+        start_date: date,
+        end_date: date
+    ) -> str:
+        """
+        Cache key of a symbol's series, which also names its spill directory
+        """
+        return f"{symbol}_{source_name}_{generation}_{timeframe}_{start_date}_{end_date}"
+    
+    def _source_generation(self, source_name: str) -> int:
+        """
+        Upload generation of a data source. Every upload bumps it, so series
+        cached from earlier uploads (in memory, spilled to disk by any worker
+        or stored in Redis) are never hit again.
+        """
+        try:
+            return int(redis_binary_client.get(f"srcgen:{source_name}") or 0)
+        except redis.RedisError as e:
+            logger.warning(f"Redis unavailable, assuming the first upload of {source_name}: {str(e)}")
+            return 0
+    
+    def _cache_series(self, cache_key: str, symbol: str, source_name: str, columns: Dict[str, np.ndarray]):
+        """
+        Store a symbol's column arrays in the cache and index the symbol by source
+        """
+        # Fresh data supersedes anything spilled under the same key
+        shutil.rmtree(self._spill_path(cache_key), ignore_errors=True)
+        
+        self._insert_series(cache_key, columns)
+        self.source_symbols[source_name].add(symbol)
+    
+    def _get_cached_series(self, cache_key: str, symbol: str, source_name: str) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Look up cached column arrays, reloading spilled series from disk
+        """
+        if cache_key in self.data_cache:
+            self.data_cache.move_to_end(cache_key)
+            return self.data_cache[cache_key]
+        
+        spill_path = self._spill_path(cache_key)
+        if not os.path.isdir(spill_path):
+            return None
+        
+        logger.debug(f"Reloading spilled data for {symbol}")
+        columns = {
+            column: np.load(os.path.join(spill_path, f"{column}.npy"), mmap_mode="r")
+            for column in PRICE_COLUMNS + ["volume", "dates"]
+        }
+        self._insert_series(cache_key, columns)
+        self.source_symbols[source_name].add(symbol)
+        return columns
+    
+    def _insert_series(self, cache_key: str, columns: Dict[str, np.ndarray]):
+        """
+        Insert into the LRU cache, spilling the oldest entries past DATA_CACHE_SIZE
+        """
+        self.data_cache[cache_key] = columns
+        self.data_cache.move_to_end(cache_key)
+        
+        while len(self.data_cache) > settings.DATA_CACHE_SIZE:
+            evicted_key, evicted = self.data_cache.popitem(last=False)
+            self._spill_series(evicted_key, evicted)
+    
+    def _spill_series(self, cache_key: str, columns: Dict[str, np.ndarray]):
+        """
+        Write evicted column arrays to DATA_CACHE_DIR as one .npy file per column
+        """
+        spill_path = self._spill_path(cache_key)
+        if os.path.isdir(spill_path):
+            # Already on disk (possibly the file these arrays are mapped from)
+            return
+        
+        # Write under a temporary name so readers never see a partial spill
+        tmp_path = f"{spill_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(tmp_path, exist_ok=True)
+            for column, values in columns.items():
+                np.save(os.path.join(tmp_path, f"{column}.npy"), values)
+            os.rename(tmp_path, spill_path)
+        except OSError as e:
+            logger.warning(f"Could not spill cached data for {cache_key}: {str(e)}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+    
+    def _spill_path(self, cache_key: str) -> str:
+        """
+        Directory holding the spilled columns of a cache entry
+        """
+        return os.path.join(settings.DATA_CACHE_DIR, hashlib.sha1(cache_key.encode()).hexdigest())
+    
+    def _to_columns(self, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """
+        Convert a date-indexed OHLCV DataFrame into contiguous column arrays
+        """
+        columns = {column: df[column].to_numpy(dtype=np.float32) for column in PRICE_COLUMNS}
+        columns["volume"] = self._to_volume(df["volume"].to_numpy(dtype=np.float64))
+        columns["dates"] = df.index.to_numpy(dtype="datetime64[ns]")
+        return columns
+    
+    def _to_volume(self, volume: np.ndarray) -> np.ndarray:
+        """
+        Convert volume to uint32, treating missing values as zero
+        """
+        volume = np.nan_to_num(volume, nan=0.0)
+        return np.clip(volume, 0, np.iinfo(np.uint32).max).astype(np.uint32)
+    
+    def _to_frame(self, symbol: str, columns: Dict[str, np.ndarray]) -> pd.DataFrame:
+        """
+        Build a DataFrame view over cached column arrays
+        """
+        return pd.DataFrame(
+            {
+                **{column: columns[column] for column in PRICE_COLUMNS},
+                "volume": columns["volume"],
+                "symbol": symbol
+            },
+            index=pd.DatetimeIndex(columns["dates"], name="date", copy=False),
+            copy=False
+        )
+    
+    def _historical_data_key(
+        self,
+        symbols: List[str],
+        start_date: date,
+        end_date: date,
+        timeframe: str,
+        data_source: str,
+        generation: int
+    ) -> str:
+        """
+        Redis key for a historical data request
+        """
+        payload = json.dumps({
+            "s": sorted(symbols),
+            "a": str(start_date),
+            "b": str(end_date),
+            "t": timeframe,
+            "d": data_source,
+            "g": generation
+        })
+        return "hist:" + hashlib.sha1(payload.encode()).hexdigest()
+    
+    def _read_cached_frames(self, key: str) -> Optional[Dict[str, pd.DataFrame]]:
+        """
+        Load per-symbol frames stored as a single Parquet blob in Redis
+        """
+        try:
+            cached = redis_binary_client.get(key)
+        except redis.RedisError as e:
+            logger.warning(f"Redis unavailable, skipping data cache: {str(e)}")
+            return None
+        
+        if cached is None:
+            return None
+        
+        logger.debug(f"Using Redis cached data for {key}")
+        df = pd.read_parquet(io.BytesIO(cached))
+        return {
+            symbol: group
+            for symbol, group in df.groupby("symbol", sort=False)
+        }
+    
+    def _write_cached_frames(self, key: str, frames: Dict[str, pd.DataFrame]):
+        """
+        Store per-symbol frames in Redis as a single Parquet blob
+        """
+        if not frames:
+            return
+        
+        buf = io.BytesIO()
+        pd.concat(frames.values()).to_parquet(buf)
+        
+        try:
+            redis_binary_client.setex(key, settings.HISTORICAL_DATA_TTL, buf.getvalue())
+        except redis.RedisError as e:
+            logger.warning(f"Redis unavailable, skipping data cache: {str(e)}")
+    
     def store_custom_data(self, df: pd.DataFrame, source_name: str) -> List[str]:
         """
         Store custom data uploaded by the user
@@ -88,23 +325,99 @@ class DataManager:
             "timeframes": ["1d"] # Assume daily data for simplicity
         }
         
-        # Store data for each symbol
-        for symbol in symbols:
-            symbol_df = df[df['symbol'] == symbol].copy()
-            
-            # Ensure date is properly formatted
-            symbol_df['date'] = pd.to_datetime(symbol_df['date'])
-            
-            # Set date as index
-            symbol_df.set_index('date', inplace=True)
-            symbol_df.sort_index(inplace=True)
-            
+        # Persist the raw rows before splitting them up
+        self._bulk_insert_market_data(df, source_name)
+        
+        # Move the source to a new generation so no worker serves series
+        # cached from the data this upload replaced
+        try:
+            generation = int(redis_binary_client.incr(f"srcgen:{source_name}"))
+        except redis.RedisError as e:
+            logger.warning(f"Redis unavailable, cached data of {source_name} may be stale: {str(e)}")
+            generation = 0
+        
+        # Parse dates and sort once, then split by symbol in a single pass
+        dated = df.assign(date=pd.to_datetime(df['date'])).set_index('date').sort_index(kind='stable')
+        
+        for symbol, symbol_df in dated.groupby('symbol', sort=False, observed=True):
             # Store in cache
-            cache_key = f"{symbol}_{source_name}_1d_{symbol_df.index.min().date()}_{symbol_df.index.max().date()}"
-            self.data_cache[cache_key] = symbol_df
+            cache_key = self._series_key(
+                symbol, source_name, generation, "1d", symbol_df.index.min().date(), symbol_df.index.max().date()
+            )
+            self._cache_series(cache_key, symbol, source_name, self._to_columns(symbol_df))
         
         return symbols
     
+    def _load_market_data(
+        self,
+        symbols: List[str],
+        start_date: date,
+        end_date: date,
+        source_name: str
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Load stored market data for all requested symbols with a single query
+        """
+        query = (
+            select(
+                MarketData.date,
+                MarketData.symbol,
+                MarketData.open,
+                MarketData.high,
+                MarketData.low,
+                MarketData.close,
+                MarketData.volume
+            )
+            .where(
+                MarketData.source == source_name,
+                MarketData.symbol.in_(symbols),
+                MarketData.date >= start_date,
+                MarketData.date < end_date + timedelta(days=1)
+            )
+            .order_by(MarketData.symbol, MarketData.date)
+        )
+        
+        with engine.connect() as conn:
+            df = pd.read_sql(query, conn, parse_dates=["date"])
+        
+        return {
+            symbol: group.set_index("date")
+            for symbol, group in df.groupby("symbol", sort=False)
+        }
+    
+    def _bulk_insert_market_data(self, df: pd.DataFrame, source_name: str):
+        """
+        Bulk load uploaded rows into the market_data table, replacing any
+        previous upload for the same source
+        """
+        rows = df.assign(source=source_name)[MARKET_DATA_COLUMNS]
+        
+        if engine.dialect.name != "postgresql":
+            with engine.begin() as conn:
+                conn.execute(delete(MarketData).where(MarketData.source == source_name))
+                rows.to_sql("market_data", conn, if_exists="append", index=False, method="multi", chunksize=10000)
+            return
+        
+        # COPY avoids per-row parameter binding and round-trips
+        buf = io.StringIO()
+        rows.to_csv(buf, index=False, header=False)
+        buf.seek(0)
+        
+        raw_conn = engine.raw_connection()
+        try:
+            cur = raw_conn.cursor()
+            cur.execute("DELETE FROM market_data WHERE source = %s", (source_name,))
+            cur.copy_expert(
+                f"COPY market_data ({', '.join(MARKET_DATA_COLUMNS)}) FROM STDIN WITH CSV",
+                buf
+            )
+            raw_conn.commit()
+        except Exception:
+            raw_conn.rollback()
+            raise
+        finally:
+            raw_conn.close()
+    
     def list_data_sources(self) -> List[DataSource]:
         """
         List available data sources
@@ -134,26 +447,16 @@ class DataManager:
         if source is None or source == "default":
             return self.default_symbols
         
-        # Extract symbols from cache keys
-        symbols = set()
-        source_prefix = f"_{source}_"
-        
-        for cache_key in self.data_cache.keys():
-            if source_prefix in cache_key:
-                symbol = cache_key.split('_')[0]
-                symbols.add(symbol)
-        
-        return list(symbols)
+        return list(self.source_symbols.get(source, ()))
     
-    def _generate_synthetic_data(
+    def _synthetic_date_range(
         self, 
-        symbol: str, 
         start_date: date, 
         end_date: date, 
         timeframe: str
-    ) -> pd.DataFrame:
+    ) -> pd.DatetimeIndex:
         """
-        Generate synthetic price data for demo purposes
+        Bar timestamps for synthetic data, shared by every symbol of a request
         """
         # Convert dates to pandas datetime
         start_pd = pd.Timestamp(start_date)
@@ -161,49 +464,72 @@ class DataManager:
         
         # Generate date range based on timeframe
         if timeframe == "1d":
-            date_range = pd.date_range(start=start_pd, end=end_pd, freq='B')
+            return pd.date_range(start=start_pd, end=end_pd, freq='B')
         elif timeframe == "1h":
-            date_range = pd.date_range(start=start_pd, end=end_pd, freq='H')
+            return pd.date_range(start=start_pd, end=end_pd, freq='H')
         elif timeframe == "1m":
-            date_range = pd.date_range(start=start_pd, end=end_pd, freq='T')
+            return pd.date_range(start=start_pd, end=end_pd, freq='T')
         else:
-            date_range = pd.date_range(start=start_pd, end=end_pd, freq='B')
-        
+            return pd.date_range(start=start_pd, end=end_pd, freq='B')
+    
+    def _generate_synthetic_batch(
+        self, 
+        symbols: List[str], 
+        date_range: pd.DatetimeIndex
+    ) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        Generate synthetic price data for several symbols at once, for demo purposes
+        """
+        n_symbols = len(symbols)
         n_periods = len(date_range)
         
-        # Generate random price data
-        # Use symbol hash for reproducible randomness
-        symbol_seed = sum(ord(c) for c in symbol)
-        np.random.seed(symbol_seed)
+        # Use symbol hash for reproducible randomness. Each symbol keeps its
+        # own generator so its series doesn't depend on the other symbols
+        # requested with it; only the draws happen per symbol
+        seeds = np.fromiter((zlib.crc32(s.encode()) for s in symbols), dtype=np.int64, count=n_symbols)
         
-        # Start with a base price specific to the symbol
-        base_price = (symbol_seed % 90) + 10  # Price between 10 and 100
+        volatility = np.empty(n_symbols)
+        base_volume = np.empty(n_symbols)
+        daily_returns = np.empty((n_symbols, n_periods))
+        noise = np.empty((4, n_symbols, n_periods))
         
-        # Generate price movements with some trend and volatility
-        daily_returns = np.random.normal(0.0002, 0.015, n_periods)
-        price_movements = np.cumprod(1 + daily_returns)
+        for i, seed in enumerate(seeds):
+            rng = np.random.default_rng(seed)
+            volatility[i] = rng.uniform(0.01, 0.03)
+            base_volume[i] = rng.uniform(50000, 1000000)
+            daily_returns[i] = rng.normal(0.0002, 0.015, n_periods)
+            noise[:, i] = rng.random((4, n_periods))
         
-        # Create price series
-        close_prices = base_price * price_movements
+        # Start with a base price specific to the symbol
+        base_price = (seeds % 90 + 10)[:, None]  # Price between 10 and 100
+        
+        # Create price series from the cumulative returns
+        close_prices = base_price * np.cumprod(1 + daily_returns, axis=1)
         
         # Generate other OHLCV data
-        volatility = np.random.uniform(0.01, 0.03)
-        high_prices = close_prices * (1 + np.random.uniform(0, volatility, n_periods))
-        low_prices = close_prices * (1 - np.random.uniform(0, volatility, n_periods))
-        open_prices = low_prices + np.random.uniform(0, 1, n_periods) * (high_prices - low_prices)
+        high_prices = close_prices * (1 + noise[0] * volatility[:, None])
+        low_prices = close_prices * (1 - noise[1] * volatility[:, None])
+        open_prices = low_prices + noise[2] * (high_prices - low_prices)
         
         # Volume with some randomness and correlation to price changes
-        base_volume = np.random.uniform(50000, 1000000)
-        volume = base_volume * (1 + np.abs(daily_returns) * 10) * np.random.uniform(0.5, 1.5, n_periods)
-        
-        # Create DataFrame
-        df = pd.DataFrame({
-            'open': open_prices,
-            'high': high_prices,
-            'low': low_prices,
-            'close': close_prices,
-            'volume': volume,
-            'symbol': symbol
-        }, index=date_range)
-        
-        return df
+        volume = base_volume[:, None] * (1 + np.abs(daily_returns) * 10) * (0.5 + noise[3])
+        
+        # Split into per-symbol columns only at the end; rows of the float32
+        # copies are contiguous and every symbol shares one dates array
+        prices = {
+            'open': open_prices.astype(np.float32),
+            'high': high_prices.astype(np.float32),
+            'low': low_prices.astype(np.float32),
+            'close': close_prices.astype(np.float32)
+        }
+        volume = self._to_volume(volume)
+        dates = date_range.to_numpy(dtype="datetime64[ns]")
+        
+        return {
+            symbol: {
+                **{column: prices[column][i] for column in PRICE_COLUMNS},
+                'volume': volume[i],
+                'dates': dates
+            }
+            for i, symbol in enumerate(symbols)
+        }
@@ -0,0 +1,16 @@
+import numpy as np
+
+# Kept free of PyCUDA so the API process can import it without creating a
+# CUDA context
+
+def close_price_dtype(close: np.ndarray) -> np.dtype:
+    """
+    Dtype to upload close prices to the GPU kernels as: FP16 when every price
+    survives the narrowing, FP32 otherwise. Larger prices would become
+    infinities, and since the prefix sums run over the whole batch, they
+    would corrupt the windows of every later symbol.
+    """
+    max_close = float(np.abs(close).max(initial=0))
+    if max_close <= float(np.finfo(np.float16).max):
+        return np.dtype(np.float16)
+    return np.dtype(np.float32)
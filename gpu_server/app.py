@@ -2,47 +2,60 @@
 Main application file for the GPU Server
 """
 import os
+import time
 import logging
+import threading
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, scoped_session
 
 # Import configuration
 import config
 
 # Import components
-from data_service.data_processor import DataProcessor
+from data_service.data_processor import DataProcessor, Session as DataSession
 from gpu_engine.engine import GPUBacktestEngine
 from models.job import BacktestRequest, BacktestResult, JobStatus
 from utils.auth import require_api_key
+from utils.json_provider import OrjsonProvider
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
-# Set up database connection
-engine = create_engine(config.DATABASE_URL)
-Base = declarative_base()
-session_factory = sessionmaker(bind=engine)
-Session = scoped_session(session_factory)
-
-# Initialize components
+# Initialize components (once per Gunicorn worker, after the fork)
 data_processor = DataProcessor()
 gpu_engine = GPUBacktestEngine()
 
+# Latest GPU status snapshot, shared by the health and status endpoints
+_status_lock = threading.Lock()
+_status_cache = {"time": 0.0, "status": None}
+
+def get_gpu_status():
+    """Get GPU status, querying the device at most once per GPU_STATUS_TTL"""
+    with _status_lock:
+        now = time.monotonic()
+        if _status_cache["status"] is None or now - _status_cache["time"] >= config.GPU_STATUS_TTL:
+            _status_cache["status"] = gpu_engine.get_status()
+            _status_cache["time"] = now
+        return _status_cache["status"]
+
 # Register middleware
 if config.API_KEY_REQUIRED:
     logger.info("API Key authentication enabled")
 
+@app.teardown_appcontext
+def remove_session(exception=None):
+    """Release the request thread's database session"""
+    DataSession.remove()
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    gpu_status = gpu_engine.get_status()
+    gpu_status = get_gpu_status()
     return jsonify({
         "status": "healthy",
         "gpu": gpu_status,
@@ -153,7 +166,7 @@ def upload_data():
 def gpu_status():
     """Get GPU status"""
     try:
-        status = gpu_engine.get_status()
+        status = get_gpu_status()
         return jsonify({
             "status": "success",
             "gpu_status": status
@@ -180,11 +193,4 @@ def list_strategies():
         return jsonify({
             "status": "error",
             "message": str(e)
-        }), 400
-
-if __name__ == '__main__':
-    app.run(
-        host=config.HOST,
-        port=config.PORT,
-        debug=config.DEBUG
-    )
\ No newline at end of file
+        }), 400
\ No newline at end of file
@@ -2,26 +2,181 @@
 Data processing module for the GPU server
 """
 import os
+import zlib
 import logging
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Optional, Any, Union
+from collections import OrderedDict
 from datetime import datetime, date
+import functools
+import threading
+import time
 import requests
-from io import BytesIO
+import orjson
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+import pyarrow.dataset as ds
+import pyarrow.json as paj
+import pyarrow.parquet as pq
+from urllib.parse import quote, unquote
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import DeclarativeBase, sessionmaker, scoped_session
+from sqlalchemy.dialects import postgresql, sqlite
 import config
 from models.job import DataSource
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Set up database connection
-Base = declarative_base()
-engine = create_engine(config.DATABASE_URL)
-Session = sessionmaker(bind=engine)
+try:
+    # Numba fuses the synthetic price arithmetic into a single compiled pass
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Set up database connection; each thread reuses its own session, which
+# request handlers release on teardown
+class Base(DeclarativeBase):
+    pass
+
+engine = create_engine(config.DATABASE_URL, pool_size=8, max_overflow=16, pool_pre_ping=True)
+Session = scoped_session(sessionmaker(bind=engine, expire_on_commit=False))
+
+# Cached prices are float32, the precision the CUDA kernels read
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+# Parquet cache files: ZSTD is smaller than the default snappy at similar
+# read speed, and modest row groups let date filters skip whole groups
+PARQUET_WRITE_OPTIONS = {
+    'engine': 'pyarrow',
+    'compression': 'zstd',
+    'compression_level': 3,
+    'row_group_size': 50_000,
+    'use_dictionary': True
+}
+
+# Custom sources are stored as a hive-partitioned dataset, one directory
+# per symbol (symbol=<URI-escaped symbol>) holding a single data file
+SYMBOL_PARTITIONING = ds.partitioning(pa.schema([('symbol', pa.string())]), flavor='hive')
+PARTITION_FILE = 'part-0.parquet'
+
+# Sources uploaded before partitioning hold one <symbol>.parquet file per
+# symbol at the top of the source directory. They are still read, with a
+# symbol's partition taking precedence once it is uploaded again
+LEGACY_SUFFIX = '.parquet'
+
+# Arrow keeps a file open per partition it writes and starts another file
+# in a partition once it has to close one, so uploads are written this
+# many symbols at a time to keep each symbol in PARTITION_FILE
+SYMBOLS_PER_WRITE = 512
+
+# Supported-tickers listing cached under DATA_CACHE_DIR with its ETag
+TIINGO_SYMBOLS_FILE = '.tiingo_symbols.json'
+
+# Tiingo price fields the backtester uses, typed so parsing skips
+# inference; other fields in the response are dropped. Dates arrive as ISO
+# strings and are parsed by Arrow
+TIINGO_SCHEMA = pa.schema([
+    ('date', pa.string()),
+    ('open', pa.float32()),
+    ('high', pa.float32()),
+    ('low', pa.float32()),
+    ('close', pa.float32()),
+    ('volume', pa.float64())
+])
+
+# Parsed footers of recently read parquet cache files
+PARQUET_METADATA_CACHE_SIZE = 1024
+
+
+@functools.lru_cache(maxsize=PARQUET_METADATA_CACHE_SIZE)
+def _parquet_metadata(path: str, mtime: float) -> pq.FileMetaData:
+    """
+    Footer metadata of a parquet file; mtime is part of the cache key so a
+    rewritten file is parsed again
+    """
+    return pq.ParquetFile(path).metadata
+
+# Known column types for uploaded CSVs, so parsing skips type inference.
+# Volume is optional in uploads and is converted by _downcast_ohlcv
+UPLOAD_DTYPES = {
+    **{column: 'float32' for column in PRICE_COLUMNS},
+    'symbol': 'category'
+}
+
+# The same types for JSON Lines uploads parsed by Arrow
+UPLOAD_JSON_SCHEMA = pa.schema([
+    ('date', pa.timestamp('ns')),
+    ('symbol', pa.string()),
+    *[(column, pa.float32()) for column in PRICE_COLUMNS]
+])
+
+
+def _read_json_upload(file_obj) -> pd.DataFrame:
+    """
+    Parse a JSON upload with Arrow's multithreaded reader when it is JSON
+    Lines, falling back to pandas for other layouts such as a records array
+    """
+    try:
+        table = paj.read_json(file_obj, parse_options=paj.ParseOptions(explicit_schema=UPLOAD_JSON_SCHEMA))
+        return table.to_pandas(self_destruct=True)
+    except pa.ArrowInvalid:
+        if hasattr(file_obj, 'seek'):
+            file_obj.seek(0)
+        return pd.read_json(file_obj)
+
+
+def _parse_date(value: str) -> date:
+    """
+    Parse a YYYY-MM-DD date, taking the fast ISO path first; strptime still
+    accepts the unpadded forms it always has
+    """
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+# Volume is stored as uint32; larger counts are clamped to this
+VOLUME_MAX = np.iinfo(np.uint32).max
+
+
+def _downcast_ohlcv(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert OHLCV columns in place to float32 prices and uint32 volume
+    """
+    for column in PRICE_COLUMNS:
+        df[column] = df[column].astype(np.float32)
+    
+    if 'volume' in df.columns:
+        # Missing or out-of-range volume would wrap around in an unsigned cast
+        volume = df['volume'].fillna(0).clip(0, VOLUME_MAX)
+        df['volume'] = volume.astype(np.uint32)
+    
+    return df
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _synthetic_prices(steps, spreads, positions, out):
+        """
+        Fill out (open, high, low, close rows) from the random walk steps,
+        relative spreads and open positions within each bar's range
+        """
+        level = 0.0
+        for i in range(steps.shape[0]):
+            level += steps[i]
+            close = max(level + 100.0, 1.0)
+            spread = spreads[i] * close
+            low = close - spread
+            out[0, i] = low + positions[i] * (2 * spread)
+            out[1, i] = close + spread
+            out[2, i] = low
+            out[3, i] = close
 
 class CustomDataSource(Base):
     """Custom data source database model"""
@@ -33,6 +188,22 @@ class CustomDataSource(Base):
     symbols_count = Column(Integer, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+
+def _upsert_custom_source(**values):
+    """
+    Single-statement insert of a custom data source row that refreshes the
+    symbol count and upload time when the name already exists
+    """
+    dialect = sqlite if engine.dialect.name == 'sqlite' else postgresql
+    stmt = dialect.insert(CustomDataSource).values(**values)
+    return stmt.on_conflict_do_update(
+        index_elements=[CustomDataSource.name],
+        set_={
+            'symbols_count': stmt.excluded.symbols_count,
+            'created_at': stmt.excluded.created_at
+        }
+    )
+
 class DataProcessor:
     """
     Data processing and management for backtesting
@@ -45,8 +216,16 @@ class DataProcessor:
         # Create data cache directory if it doesn't exist
         os.makedirs(config.DATA_CACHE_DIR, exist_ok=True)
         
-        # Initialize in-memory cache
-        self.data_cache = {}
+        # In-memory LRU cache of (frame, size in bytes), bounded by entry
+        # count and bytes; request threads share it, so access goes through
+        # _cache_get/_cache_put
+        self.data_cache = OrderedDict()
+        self.data_cache_bytes = 0
+        self.cache_lock = threading.RLock()
+        
+        # Custom source symbol listings as (time, symbols), reused for
+        # SYMBOL_LIST_TTL seconds
+        self.symbol_listings = {}
         
         # Create database tables if they don't exist
         Base.metadata.create_all(engine)
@@ -55,6 +234,17 @@ class DataProcessor:
         self.tiingo_api_key = config.TIINGO_API_KEY
         if self.tiingo_api_key:
             logger.info("Tiingo API key provided, external data access enabled")
+        
+        # One session for all Tiingo calls, with a connection pool sized for
+        # the concurrent per-symbol fetches
+        self.tiingo_session = requests.Session()
+        self.tiingo_session.headers.update({
+            'Content-Type': 'application/json',
+            'Accept-Encoding': 'gzip',
+            'Authorization': f'Token {self.tiingo_api_key}'
+        })
+        adapter = HTTPAdapter(pool_connections=config.TIINGO_MAX_WORKERS, pool_maxsize=config.TIINGO_MAX_WORKERS)
+        self.tiingo_session.mount('https://', adapter)
     
     def get_historical_data(
         self,
@@ -62,7 +252,8 @@ class DataProcessor:
         start_date: Union[str, date],
         end_date: Union[str, date],
         timeframe: str = "1d",
-        data_source: str = "default"
+        data_source: str = "default",
+        columns: Optional[List[str]] = None
     ) -> Dict[str, pd.DataFrame]:
         """
         Get historical OHLCV data for the specified symbols
@@ -73,6 +264,7 @@ class DataProcessor:
             end_date: End date for historical data
             timeframe: Data timeframe (e.g., "1d", "1h", "5m")
             data_source: Data source to use
+            columns: Columns to return; None returns all of them
             
         Returns:
             Dictionary of DataFrames with historical data for each symbol
@@ -81,25 +273,29 @@ class DataProcessor:
         
         # Convert string dates to datetime objects if needed
         if isinstance(start_date, str):
-            start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+            start_date = _parse_date(start_date)
         if isinstance(end_date, str):
-            end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+            end_date = _parse_date(end_date)
         
         # Check if this is a custom data source
         if data_source != "default" and data_source != "tiingo":
-            return self._load_custom_data(symbols, start_date, end_date, timeframe, data_source)
+            return self._load_custom_data(symbols, start_date, end_date, timeframe, data_source, columns)
         
         result = {}
         missing_symbols = []
+        ts_start = pd.Timestamp(start_date)
+        ts_end = pd.Timestamp(end_date)
         
         # First try to load from cache
         for symbol in symbols:
             cache_key = f"{symbol}_{timeframe}_{data_source}"
-            if cache_key in self.data_cache:
-                # Filter cached data to requested date range
-                df = self.data_cache[cache_key]
-                mask = (df.index >= pd.Timestamp(start_date)) & (df.index <= pd.Timestamp(end_date))
-                filtered_df = df.loc[mask]
+            df = self._cache_get(cache_key)
+            if df is not None:
+                # Cached frames are sorted by date, so the requested range is
+                # found by binary search and sliced without a copy
+                filtered_df = df.iloc[df.index.slice_indexer(ts_start, ts_end)]
+                if columns is not None:
+                    filtered_df = filtered_df[columns]
                 
                 if not filtered_df.empty:
                     result[symbol] = filtered_df
@@ -108,6 +304,26 @@ class DataProcessor:
             else:
                 missing_symbols.append(symbol)
         
+        # Then the on-disk cache of earlier loads, which may outlive this process
+        disk_data = self._read_parquet_files(
+            {
+                symbol: config.DATA_CACHE_DIR / f"{symbol}_{timeframe}_{data_source}.parquet"
+                for symbol in missing_symbols
+            },
+            ts_start,
+            ts_end,
+            columns
+        )
+        still_missing = []
+        for symbol in missing_symbols:
+            df = disk_data.get(symbol)
+            
+            if df is not None and not df.empty:
+                result[symbol] = df
+            else:
+                still_missing.append(symbol)
+        missing_symbols = still_missing
+        
         # Try to load missing data from external sources
         if missing_symbols:
             if data_source == "default" or data_source == "tiingo":
@@ -125,15 +341,23 @@ class DataProcessor:
             else:
                 logger.warning(f"Unknown data source: {data_source}")
         
-        # Cache any new data
-        for symbol, df in result.items():
-            if symbol not in self.data_cache:
+        # Cache any new data, sorted by date for the slicing above
+        for symbol in missing_symbols:
+            if symbol in result:
+                df = result[symbol]
+                if not df.index.is_monotonic_increasing:
+                    df = result[symbol] = df.sort_index(kind='stable')
+                
                 cache_key = f"{symbol}_{timeframe}_{data_source}"
-                self.data_cache[cache_key] = df
+                self._cache_put(cache_key, df)
                 
                 # Save to disk cache
                 cache_file = config.DATA_CACHE_DIR / f"{cache_key}.parquet"
-                df.to_parquet(cache_file)
+                df.to_parquet(cache_file, **PARQUET_WRITE_OPTIONS)
+                
+                # Cached in full above; the caller only gets what it asked for
+                if columns is not None:
+                    result[symbol] = df[columns]
         
         if len(result) < len(symbols):
             missing = set(symbols) - set(result.keys())
@@ -141,6 +365,42 @@ class DataProcessor:
         
         return result
     
+    def _cache_get(self, cache_key: str) -> Optional[pd.DataFrame]:
+        """
+        Look up a cached frame, marking it as recently used
+        """
+        with self.cache_lock:
+            entry = self.data_cache.get(cache_key)
+            if entry is None:
+                return None
+            
+            self.data_cache.move_to_end(cache_key)
+            return entry[0]
+    
+    def _cache_put(self, cache_key: str, df: pd.DataFrame):
+        """
+        Cache a frame, evicting the least recently used ones past
+        DATA_CACHE_SIZE entries or DATA_CACHE_MAX_BYTES
+        """
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        
+        with self.cache_lock:
+            previous = self.data_cache.pop(cache_key, None)
+            if previous is not None:
+                self.data_cache_bytes -= previous[1]
+            
+            self.data_cache[cache_key] = (df, nbytes)
+            self.data_cache_bytes += nbytes
+            
+            # The newest entry always stays, even if it is over budget alone
+            while len(self.data_cache) > 1 and (
+                len(self.data_cache) > config.DATA_CACHE_SIZE
+                or self.data_cache_bytes > config.DATA_CACHE_MAX_BYTES
+            ):
+                evicted_key, (_, evicted_bytes) = self.data_cache.popitem(last=False)
+                self.data_cache_bytes -= evicted_bytes
+                logger.debug(f"Evicted {evicted_key} from data cache ({evicted_bytes} bytes)")
+    
     def store_custom_data(self, file, source_name: str) -> List[str]:
         """
         Store custom data uploaded by the user
@@ -156,10 +416,10 @@ class DataProcessor:
         
         # Read file into DataFrame
         if hasattr(file, 'filename'):
-            # This is a Flask FileStorage object
+            # This is a Flask FileStorage object; parse straight from its
+            # spooled stream rather than buffering a second copy in memory
             filename = file.filename
-            file_content = file.read()
-            file_obj = BytesIO(file_content)
+            file_obj = file.stream
         else:
             # This might be a path or file-like object
             filename = str(file)
@@ -167,11 +427,13 @@ class DataProcessor:
         
         try:
             if filename.endswith('.csv'):
-                df = pd.read_csv(file_obj, parse_dates=['date'])
+                df = pd.read_csv(file_obj, engine='pyarrow', dtype=UPLOAD_DTYPES, parse_dates=['date'])
             elif filename.endswith('.parquet'):
-                df = pd.read_parquet(file_obj)
+                # Files already on disk are mapped rather than read into a
+                # buffer first
+                df = pd.read_parquet(file_obj, memory_map=isinstance(file_obj, (str, os.PathLike)))
             elif filename.endswith('.json'):
-                df = pd.read_json(file_obj)
+                df = _read_json_upload(file_obj)
             else:
                 raise ValueError(f"Unsupported file format: {filename}")
         except Exception as e:
@@ -185,56 +447,61 @@ class DataProcessor:
         if missing_columns:
             raise ValueError(f"Missing required columns: {missing_columns}")
         
-        # Set date as index
+        # Set date as index, sorted so cached and stored frames can be sliced
+        # by date
         if 'date' in df.columns and not isinstance(df.index, pd.DatetimeIndex):
             df.set_index('date', inplace=True)
+        df.sort_index(kind='stable', inplace=True)
+        
+        # Down-convert once on ingest so cached and stored copies are compact
+        _downcast_ohlcv(df)
         
         # Get list of symbols
         symbols = df['symbol'].unique().tolist()
         
-        # Create directory for source if it doesn't exist
-        source_dir = config.DATA_CACHE_DIR / source_name
-        os.makedirs(source_dir, exist_ok=True)
-        
-        # Split data by symbol and store
-        for symbol in symbols:
-            symbol_data = df[df['symbol'] == symbol].copy()
-            
-            # Remove symbol column since it's redundant now
-            if 'symbol' in symbol_data.columns:
-                symbol_data.drop('symbol', axis=1, inplace=True)
-            
-            # Save to cache
-            cache_key = f"{symbol}_1d_{source_name}"
-            self.data_cache[cache_key] = symbol_data
-            
-            # Save to disk
-            cache_file = source_dir / f"{symbol}.parquet"
-            symbol_data.to_parquet(cache_file)
+        # Write the symbols' partitions in multithreaded passes; symbols
+        # written again replace their earlier data
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        symbol_column = table.schema.get_field_index('symbol')
+        table = table.set_column(symbol_column, 'symbol', table['symbol'].cast(pa.string()))
+        partition_symbols = pc.unique(table['symbol'])
+        
+        parquet_format = ds.ParquetFileFormat()
+        file_options = parquet_format.make_write_options(
+            compression=PARQUET_WRITE_OPTIONS['compression'],
+            compression_level=PARQUET_WRITE_OPTIONS['compression_level']
+        )
+        for i in range(0, len(partition_symbols), SYMBOLS_PER_WRITE):
+            batch_symbols = partition_symbols[i:i + SYMBOLS_PER_WRITE]
+            ds.write_dataset(
+                table.filter(pc.is_in(table['symbol'], value_set=batch_symbols)),
+                base_dir=str(config.DATA_CACHE_DIR / source_name),
+                format=parquet_format,
+                partitioning=SYMBOL_PARTITIONING,
+                basename_template='part-{i}.parquet',
+                file_options=file_options,
+                max_partitions=SYMBOLS_PER_WRITE,
+                max_open_files=SYMBOLS_PER_WRITE,
+                max_rows_per_group=PARQUET_WRITE_OPTIONS['row_group_size'],
+                existing_data_behavior='delete_matching',
+                use_threads=True
+            )
+        with self.cache_lock:
+            self.symbol_listings.pop(source_name, None)
         
-        # Record in database
-        session = Session()
+        # Record in database; the transaction commits on exit and rolls back
+        # on error
         try:
-            existing = session.query(CustomDataSource).filter_by(name=source_name).first()
-            
-            if existing:
-                existing.symbols_count = len(symbols)
-                existing.created_at = datetime.utcnow()
-            else:
-                source = CustomDataSource(
+            with Session.begin():
+                Session.execute(_upsert_custom_source(
                     name=source_name,
                     description=f"Custom data source uploaded on {datetime.now().strftime('%Y-%m-%d')}",
-                    symbols_count=len(symbols)
-                )
-                session.add(source)
-                
-            session.commit()
+                    symbols_count=len(symbols),
+                    created_at=datetime.utcnow()
+                ))
         except Exception as e:
-            session.rollback()
             logger.error(f"Error saving to database: {str(e)}")
             raise
-        finally:
-            session.close()
         
         return symbols
     
@@ -269,22 +536,20 @@ class DataProcessor:
             ))
         
         # Add custom sources from database
-        session = Session()
         try:
-            custom_sources = session.query(CustomDataSource).all()
-            
-            for source in custom_sources:
-                sources.append(DataSource(
-                    id=source.name,
-                    name=source.name,
-                    description=source.description,
-                    symbols_count=source.symbols_count,
-                    created_at=source.created_at
-                ))
+            with Session.begin():
+                custom_sources = Session.query(CustomDataSource).all()
+                
+                for source in custom_sources:
+                    sources.append(DataSource(
+                        id=source.name,
+                        name=source.name,
+                        description=source.description,
+                        symbols_count=source.symbols_count,
+                        created_at=source.created_at
+                    ))
         except Exception as e:
             logger.error(f"Error querying database: {str(e)}")
-        finally:
-            session.close()
         
         return sources
     
@@ -308,15 +573,26 @@ class DataProcessor:
             return self._get_tiingo_symbols()
         else:
             # Check if it's a custom source
-            # Look for parquet files in the source directory
+            with self.cache_lock:
+                listing = self.symbol_listings.get(source)
+            if listing is not None and time.monotonic() - listing[0] < config.SYMBOL_LIST_TTL:
+                return list(listing[1])
+            
+            # Look for symbol partitions and legacy per-symbol files in the
+            # source directory
             source_dir = config.DATA_CACHE_DIR / source
             if os.path.exists(source_dir) and os.path.isdir(source_dir):
-                symbols = []
-                for file in os.listdir(source_dir):
-                    if file.endswith('.parquet'):
-                        symbol = file.replace('.parquet', '')
-                        symbols.append(symbol)
-                return symbols
+                symbols = {}
+                with os.scandir(source_dir) as entries:
+                    for entry in entries:
+                        if entry.name.startswith('symbol=') and entry.is_dir(follow_symlinks=False):
+                            symbols[unquote(entry.name[len('symbol='):])] = None
+                        elif entry.name.endswith(LEGACY_SUFFIX) and entry.is_file():
+                            symbols[entry.name[:-len(LEGACY_SUFFIX)]] = None
+                symbols = list(symbols)
+                with self.cache_lock:
+                    self.symbol_listings[source] = (time.monotonic(), symbols)
+                return list(symbols)
             else:
                 logger.warning(f"Unknown data source: {source}")
                 return []
@@ -335,7 +611,7 @@ class DataProcessor:
             logger.warning("No Tiingo API key provided")
             return {}
         
-        result = {}
+        tables = {}
         
         # Convert timeframe to Tiingo format
         tiingo_timeframe = "daily"
@@ -346,80 +622,146 @@ class DataProcessor:
         start_str = start_date.strftime("%Y-%m-%d")
         end_str = end_date.strftime("%Y-%m-%d")
         
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Token {self.tiingo_api_key}'
+        # CSV responses parse straight into typed Arrow columns, with no
+        # intermediate Python objects per row
+        params = {
+            'startDate': start_str,
+            'endDate': end_str,
+            'format': 'csv',
+            'columns': ','.join(TIINGO_SCHEMA.names)
         }
         
-        for symbol in symbols:
-            try:
-                url = f"https://api.tiingo.com/tiingo/{tiingo_timeframe}/{symbol}/prices"
-                params = {
-                    'startDate': start_str,
-                    'endDate': end_str,
-                    'format': 'json'
-                }
-                
-                response = requests.get(url, headers=headers, params=params)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    # Convert to DataFrame
-                    df = pd.DataFrame(data)
-                    
-                    # Rename columns to match expected format
-                    column_map = {
-                        'date': 'date',
-                        'open': 'open',
-                        'high': 'high',
-                        'low': 'low',
-                        'close': 'close',
-                        'volume': 'volume'
-                    }
-                    
-                    df = df.rename(columns={k: v for k, v in column_map.items() if k in df.columns})
-                    
-                    # Set date as index
-                    if 'date' in df.columns:
-                        df['date'] = pd.to_datetime(df['date'])
-                        df.set_index('date', inplace=True)
-                    
-                    result[symbol] = df
-                else:
-                    logger.warning(f"Failed to fetch Tiingo data for {symbol}: {response.status_code} - {response.text}")
-            except Exception as e:
-                logger.error(f"Error fetching Tiingo data for {symbol}: {str(e)}")
+        # Requests are I/O bound, so fetch symbols concurrently over the
+        # session's pooled connections
+        max_workers = min(config.TIINGO_MAX_WORKERS, len(symbols)) or 1
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._fetch_tiingo_prices, symbol, tiingo_timeframe, params): symbol
+                for symbol in symbols
+            }
+            
+            for future in as_completed(futures):
+                symbol_table = future.result()
+                if symbol_table is not None and symbol_table.num_rows:
+                    tables[futures[future]] = symbol_table
         
-        return result
+        return self._tiingo_frames(tables)
+    
+    def _tiingo_frames(self, tables: Dict[str, pa.Table]) -> Dict[str, pd.DataFrame]:
+        """
+        Convert per-symbol Tiingo price tables into date-indexed frames,
+        concatenating them into one table converted to pandas once
+        """
+        if not tables:
+            return {}
+        
+        table = pa.concat_tables(tables.values())
+        
+        # Intraday dates are UTC; drop the zone to match the other data
+        # sources. Daily dates carry no offset and parse as they are
+        try:
+            dates = pc.cast(table['date'], pa.timestamp('ns', tz='UTC')).cast(pa.timestamp('ns'))
+        except pa.ArrowInvalid:
+            dates = pc.cast(table['date'], pa.timestamp('ns'))
+        table = table.set_column(table.schema.get_field_index('date'), 'date', dates)
+        
+        # Clamp in Arrow before the frame exists, so the unchecked uint32
+        # cast sees only in-range values and the volume column reaches
+        # pandas already narrowed
+        volume = pc.min_element_wise(
+            pc.max_element_wise(table['volume'].fill_null(0), 0),
+            VOLUME_MAX
+        ).cast(pa.uint32(), safe=False)
+        table = table.set_column(table.schema.get_field_index('volume'), 'volume', volume)
+        
+        df = table.to_pandas(self_destruct=True, split_blocks=True).set_index('date')
+        
+        # Symbols are back to back in the table, so each frame is a slice
+        offsets = np.cumsum([0] + [symbol_table.num_rows for symbol_table in tables.values()])
+        return {
+            symbol: df.iloc[offsets[i]:offsets[i + 1]]
+            for i, symbol in enumerate(tables)
+        }
+    
+    def _fetch_tiingo_prices(
+        self,
+        symbol: str,
+        tiingo_timeframe: str,
+        params: Dict[str, str]
+    ) -> Optional[pa.Table]:
+        """
+        Fetch one symbol's prices from Tiingo as an Arrow table, or None if
+        the request fails
+        """
+        try:
+            url = f"https://api.tiingo.com/tiingo/{tiingo_timeframe}/{symbol}/prices"
+            response = self.tiingo_session.get(url, params=params)
+            
+            if response.status_code != 200:
+                logger.warning(f"Failed to fetch Tiingo data for {symbol}: {response.status_code} - {response.text}")
+                return None
+            
+            if not response.content.strip():
+                return None
+            
+            # Symbols are already fetched concurrently, so parse each body on
+            # the calling thread
+            return pcsv.read_csv(
+                pa.BufferReader(response.content),
+                read_options=pcsv.ReadOptions(use_threads=False),
+                convert_options=pcsv.ConvertOptions(
+                    column_types=TIINGO_SCHEMA,
+                    include_columns=TIINGO_SCHEMA.names
+                )
+            )
+        except Exception as e:
+            logger.error(f"Error fetching Tiingo data for {symbol}: {str(e)}")
+            return None
     
     def _get_tiingo_symbols(self) -> List[str]:
         """
-        Get list of supported symbols from Tiingo
+        Get list of supported symbols from Tiingo, revalidating a copy
+        cached on disk by its ETag
         """
         if not self.tiingo_api_key:
             return []
         
+        cache_file = config.DATA_CACHE_DIR / TIINGO_SYMBOLS_FILE
+        cached = None
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'rb') as f:
+                    cached = orjson.loads(f.read())
+            except (OSError, orjson.JSONDecodeError) as e:
+                logger.warning(f"Ignoring unreadable Tiingo symbols cache: {str(e)}")
+        
+        headers = {'If-None-Match': cached['etag']} if cached and cached.get('etag') else {}
+        
         try:
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f'Token {self.tiingo_api_key}'
-            }
-            
-            response = requests.get(
+            response = self.tiingo_session.get(
                 "https://api.tiingo.com/tiingo/utilities/supported-tickers",
                 headers=headers
             )
             
-            if response.status_code == 200:
-                data = response.json()
-                return [item["ticker"] for item in data]
+            if response.status_code == 304 and cached:
+                return cached['symbols']
+            elif response.status_code == 200:
+                data = orjson.loads(response.content)
+                symbols = [item["ticker"] for item in data]
+                
+                # Replace the cache file atomically so concurrent readers
+                # never see a partial write
+                tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+                with open(tmp_file, 'wb') as f:
+                    f.write(orjson.dumps({'etag': response.headers.get('ETag'), 'symbols': symbols}))
+                os.replace(tmp_file, cache_file)
+                return symbols
             else:
                 logger.warning(f"Failed to fetch Tiingo symbols: {response.status_code} - {response.text}")
-                return []
+                return cached['symbols'] if cached else []
         except Exception as e:
             logger.error(f"Error fetching Tiingo symbols: {str(e)}")
-            return []
+            return cached['symbols'] if cached else []
     
     def _load_custom_data(
         self,
@@ -427,10 +769,11 @@ class DataProcessor:
         start_date: date,
         end_date: date,
         timeframe: str,
-        source_name: str
+        source_name: str,
+        columns: Optional[List[str]] = None
     ) -> Dict[str, pd.DataFrame]:
         """
-        Load data from custom source
+        Load data from custom source, reading only the requested columns
         """
         result = {}
         source_dir = config.DATA_CACHE_DIR / source_name
@@ -439,25 +782,98 @@ class DataProcessor:
             logger.warning(f"Custom data source not found: {source_name}")
             return result
         
+        ts_start = pd.Timestamp(start_date)
+        ts_end = pd.Timestamp(end_date)
+        
+        file_paths = {}
         for symbol in symbols:
+            file_path = source_dir / f"symbol={quote(symbol, safe='')}" / PARTITION_FILE
+            legacy_path = source_dir / f"{symbol}{LEGACY_SUFFIX}"
+            
+            if os.path.exists(file_path):
+                file_paths[symbol] = file_path
+            elif os.path.exists(legacy_path):
+                file_paths[symbol] = legacy_path
+            else:
+                logger.warning(f"No data file found for symbol {symbol} in source {source_name}")
+        
+        return self._read_parquet_files(file_paths, ts_start, ts_end, columns)
+    
+    def _read_parquet_files(
+        self,
+        paths: Dict[str, Any],
+        start: pd.Timestamp,
+        end: pd.Timestamp,
+        columns: Optional[List[str]] = None
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Read the date range of each symbol's parquet file that exists,
+        spreading the reads over a thread pool since Arrow decodes without
+        holding the GIL
+        """
+        paths = {symbol: path for symbol, path in paths.items() if os.path.exists(path)}
+        
+        def read(symbol):
             try:
-                file_path = source_dir / f"{symbol}.parquet"
-                
-                if os.path.exists(file_path):
-                    df = pd.read_parquet(file_path)
-                    
-                    # Filter to requested date range
-                    if isinstance(df.index, pd.DatetimeIndex):
-                        mask = (df.index >= pd.Timestamp(start_date)) & (df.index <= pd.Timestamp(end_date))
-                        df = df.loc[mask]
-                    
-                    result[symbol] = df
-                else:
-                    logger.warning(f"No data file found for symbol {symbol} in source {source_name}")
+                return self._read_parquet_range(paths[symbol], start, end, columns)
             except Exception as e:
-                logger.error(f"Error loading custom data for {symbol}: {str(e)}")
+                logger.error(f"Error loading parquet data for {symbol}: {str(e)}")
+                return None
         
-        return result
+        if len(paths) <= 1:
+            frames = map(read, paths)
+        else:
+            with ThreadPoolExecutor(max_workers=min(config.DATA_LOAD_WORKERS, len(paths))) as executor:
+                frames = list(executor.map(read, paths))
+        
+        return {
+            symbol: df
+            for symbol, df in zip(paths, frames)
+            if df is not None
+        }
+    
+    def _read_parquet_range(
+        self,
+        path,
+        start: pd.Timestamp,
+        end: pd.Timestamp,
+        columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Read the rows of a date-indexed parquet file between start and end,
+        decompressing only the row groups whose date statistics overlap them
+        and only the requested columns (all when None)
+        """
+        path = str(path)
+        metadata = _parquet_metadata(path, os.path.getmtime(path))
+        
+        # The date index is stored under its name, or as __index_level_0__
+        # for frames whose index was unnamed
+        pandas_metadata = metadata.schema.to_arrow_schema().pandas_metadata or {}
+        index_columns = [name for name in pandas_metadata.get('index_columns', []) if isinstance(name, str)]
+        date_column = metadata.schema.names.index(index_columns[0] if index_columns else 'date')
+        
+        row_groups = []
+        for i in range(metadata.num_row_groups):
+            stats = metadata.row_group(i).column(date_column).statistics
+            if stats is None or not stats.has_min_max or (
+                pd.Timestamp(stats.min) <= end and pd.Timestamp(stats.max) >= start
+            ):
+                row_groups.append(i)
+        
+        # Pre-buffering coalesces the selected column chunks into a few large
+        # reads instead of one small read per chunk
+        table = pq.ParquetFile(path, metadata=metadata, pre_buffer=True).read_row_groups(
+            row_groups, columns=columns, use_pandas_metadata=True
+        )
+        df = table.to_pandas()
+        
+        # Parallel dataset writes don't promise row order
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index(kind='stable')
+        
+        # Trim the edges of the boundary row groups
+        return df[(df.index >= start) & (df.index <= end)]
     
     def _generate_synthetic_data(
         self, 
@@ -471,41 +887,62 @@ class DataProcessor:
         """
         logger.warning(f"Generating synthetic data for {symbol} from {start_date} to {end_date}")
         
-        # Create date range
+        # Create date range, named like the index of stored data so cached
+        # copies are read back the same way
         if timeframe == "1d":
-            date_range = pd.date_range(start=start_date, end=end_date, freq='B')
+            date_range = pd.date_range(start=start_date, end=end_date, freq='B', name='date')
         elif timeframe in ["1h", "60m"]:
-            date_range = pd.date_range(start=start_date, end=end_date, freq='H')
+            date_range = pd.date_range(start=start_date, end=end_date, freq='H', name='date')
         elif timeframe in ["5m"]:
-            date_range = pd.date_range(start=start_date, end=end_date, freq='5min')
+            date_range = pd.date_range(start=start_date, end=end_date, freq='5min', name='date')
         else:
-            date_range = pd.date_range(start=start_date, end=end_date, freq='B')
+            date_range = pd.date_range(start=start_date, end=end_date, freq='B', name='date')
         
-        # Set random seed based on symbol for consistency
-        seed = sum(ord(c) for c in symbol)
-        np.random.seed(seed)
+        # Seed a private generator from the symbol for consistency; the
+        # global NumPy RNG is shared by every request thread
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()))
         
-        # Generate prices
         n = len(date_range)
-        close = 100 + np.cumsum(np.random.normal(0, 1, n))
-        daily_volatility = np.random.uniform(0.005, 0.02, n)
-        
-        # Ensure prices are positive
-        close = np.maximum(close, 1)
-        
-        # Generate OHLCV data
-        high = close + close * daily_volatility
-        low = close - close * daily_volatility
-        open_price = low + (high - low) * np.random.random(n)
-        volume = np.random.randint(100000, 1000000, n)
-        
-        # Create DataFrame
-        df = pd.DataFrame({
-            'open': open_price,
-            'high': high,
-            'low': low,
-            'close': close,
-            'volume': volume
-        }, index=date_range)
+        
+        if NUMBA_AVAILABLE:
+            # Same draws as below, combined in one pass straight into the
+            # float32 buffer
+            prices = np.empty((len(PRICE_COLUMNS), n), dtype=np.float32)
+            steps = rng.standard_normal(n)
+            spreads = rng.uniform(0.005, 0.02, n)
+            positions = rng.random(n)
+            _synthetic_prices(steps, spreads, positions, prices)
+            
+            df = pd.DataFrame(prices.T, index=date_range, columns=PRICE_COLUMNS, copy=False)
+            df['volume'] = rng.integers(100000, 1000000, n, dtype=np.uint32)
+            
+            return df
+        
+        # Build all four price series in place in one buffer, a contiguous
+        # row per column in PRICE_COLUMNS order
+        prices = np.empty((len(PRICE_COLUMNS), n))
+        open_price, high, low, close = prices
+        
+        # Random walk for close prices, kept positive
+        rng.standard_normal(n, out=close)
+        np.cumsum(close, out=close)
+        close += 100
+        np.maximum(close, 1, out=close)
+        
+        # High and low sit one daily volatility either side of the close
+        spread = rng.uniform(0.005, 0.02, n)
+        spread *= close
+        np.add(close, spread, out=high)
+        np.subtract(close, spread, out=low)
+        
+        # Open anywhere between low and high
+        rng.random(n, out=open_price)
+        open_price *= 2 * spread
+        open_price += low
+        
+        # Columns are produced at their cached dtypes, so the frame wraps a
+        # single float32 block without further conversion
+        df = pd.DataFrame(prices.astype(np.float32).T, index=date_range, columns=PRICE_COLUMNS, copy=False)
+        df['volume'] = rng.integers(100000, 1000000, n, dtype=np.uint32)
         
         return df
\ No newline at end of file
@@ -2,19 +2,21 @@
 GPU-accelerated backtesting engine
 """
 import os
+import atexit
 import uuid
 import logging
 import time
+import functools
+import orjson
 import numpy as np
-import pandas as pd
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 import threading
 import queue
 from concurrent.futures import ThreadPoolExecutor
-from sqlalchemy import create_engine, Column, String, Float, JSON, DateTime, Text, Integer, ForeignKey
-from sqlalchemy.orm import sessionmaker, relationship
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import create_engine, update, Column, String, Float, JSON, DateTime, Text, Integer, ForeignKey
+from sqlalchemy.orm import DeclarativeBase, sessionmaker, relationship
+from sqlalchemy.dialects.postgresql import JSONB
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -23,9 +25,9 @@ try:
     # Try to import CUDA libraries
     # These will be available on the GPU server but may not be during development
     import pycuda.driver as cuda
-    import pycuda.autoinit
     import pycuda.gpuarray as gpuarray
     from pycuda.compiler import SourceModule
+    from pycuda.tools import DeviceMemoryPool, PageLockedMemoryPool
     CUDA_AVAILABLE = True
     logger.info("CUDA is available")
 except ImportError:
@@ -41,6 +43,15 @@ except ImportError:
     logger.warning("CuPy not available, some operations will be slower")
     CUPY_AVAILABLE = False
 
+try:
+    # Numba compiles the per-bar trade and equity loops
+    from numba import njit
+    NUMBA_AVAILABLE = True
+    logger.info("Numba is available")
+except ImportError:
+    logger.warning("Numba not available, trade and equity loops run in Python")
+    NUMBA_AVAILABLE = False
+
 # Import local modules
 import config
 from data_service.data_processor import DataProcessor
@@ -55,28 +66,80 @@ from models.job import (
     SymbolMetrics,
     Trade
 )
-from gpu_engine.kernels import get_cuda_kernel
+from gpu_engine.kernels import get_cuda_kernel, TILE_BARS
 from gpu_engine.metrics import calculate_metrics
 
 # Setup database 
-Base = declarative_base()
-engine = create_engine(config.DATABASE_URL)
+class Base(DeclarativeBase):
+    pass
+
+def _dumps_json(value: Any) -> str:
+    """
+    Encode JSON columns with orjson, which is several times faster than the
+    standard library on large result payloads
+    """
+    return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+
+engine = create_engine(config.DATABASE_URL, json_serializer=_dumps_json, json_deserializer=orjson.loads)
 Session = sessionmaker(bind=engine)
 
+# Stored as binary JSONB on PostgreSQL, plain JSON elsewhere
+JobJSON = JSON().with_variant(JSONB(), "postgresql")
+
 class BacktestRecord(Base):
     """Database model for backtest records"""
     __tablename__ = "backtest_records"
     
     id = Column(String, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=True)
-    request = Column(JSON, nullable=False)
+    request = Column(JobJSON, nullable=False)
     status = Column(String, nullable=False)
     execution_time = Column(Float, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    results = Column(JSON, nullable=True)
+    results = Column(JobJSON, nullable=True)
     error = Column(Text, nullable=True)
 
+@functools.lru_cache(maxsize=None)
+def _get_cupy_kernel(kernel_name: str, function_name: str, options: Tuple[str, ...]):
+    """
+    Compile one of the strategy kernels for the CuPy path, with the same
+    defines as the PyCUDA build. The sources include system headers, so
+    they go through nvcc rather than NVRTC.
+    """
+    module = cp.RawModule(
+        code=get_cuda_kernel(kernel_name),
+        options=options,
+        backend='nvcc'
+    )
+    return module.get_function(function_name)
+
+# Dynamic shared memory a block can use without opting in to more
+_MAX_SHARED_BYTES = 48 * 1024
+
+def _tile_launch(max_bars: int, halo: int) -> Tuple[int, int, int]:
+    """
+    Block size, blocks per symbol and dynamic shared memory bytes for a
+    windowed kernel, whose blocks stage TILE_BARS float prices per thread
+    plus the halo of window bars before them. Blocks shrink until the
+    staged prices fit.
+    """
+    block_size = 256
+    while block_size > 32 and (block_size * TILE_BARS + halo) * 4 > _MAX_SHARED_BYTES:
+        block_size //= 2
+    bars_per_block = block_size * TILE_BARS
+    return block_size, (max_bars + bars_per_block - 1) // bars_per_block, (bars_per_block + halo) * 4
+
+if CUPY_AVAILABLE:
+    # Momentum signal of a bar from its close and the close a window earlier,
+    # computed in one pass without intermediate arrays
+    _momentum_signals = cp.ElementwiseKernel(
+        'T close_now, T close_past, T threshold',
+        'T signal',
+        'T momentum = close_now / close_past - 1; signal = (momentum > threshold) - (momentum < -threshold);',
+        'momentum_signals'
+    )
+
 class GPUBacktestEngine:
     """
     GPU-accelerated backtesting engine
@@ -97,7 +160,15 @@ class GPUBacktestEngine:
         self.active_jobs = {}
         self.job_results = {}
         
-        # Set up a thread pool for job processing
+        # Creation time of each job submitted to this worker until it
+        # finishes, so responses don't read it back from the database
+        self.job_created = {}
+        
+        # Supported strategies, built once rather than on every request
+        self.strategies = self._build_strategies()
+        self.strategy_ids = frozenset(strategy.id for strategy in self.strategies)
+        
+        # Set up a thread pool for the per-symbol work of a job
         self.executor = ThreadPoolExecutor(max_workers=config.MAX_CONCURRENT_JOBS)
         
         # Initialize CUDA context if available
@@ -117,8 +188,12 @@ class GPUBacktestEngine:
     
     def _initialize_cuda(self):
         """Initialize CUDA device and context"""
+        # One context per worker process; it stays current on this thread
+        # and is pushed onto the job and status threads that use it
+        cuda.init()
         self.cuda_device = cuda.Device(config.DEFAULT_GPU_DEVICE)
         self.cuda_context = self.cuda_device.make_context()
+        atexit.register(self.cuda_context.pop)
         
         # Get device properties
         self.device_props = cuda.Device.get_attributes(self.cuda_device)
@@ -127,32 +202,63 @@ class GPUBacktestEngine:
         logger.info(f"CUDA Compute Capability: {self.cuda_device.compute_capability()}")
         logger.info(f"Total GPU Memory: {self.cuda_device.total_memory() / 1024**2} MB")
         
+        # Stream for the batched copies and kernel launch
+        self.stream = cuda.Stream()
+        
+        # Page-locked staging buffers are slow to allocate, so jobs take
+        # them from a pool that keeps freed blocks for reuse
+        self.pinned_pool = PageLockedMemoryPool()
+        
+        # Likewise for device buffers, so warm jobs skip cuMemAlloc/cuMemFree
+        # and the synchronization they imply
+        self.device_pool = DeviceMemoryPool()
+        
         # Initialize strategy kernels
         self._initialize_kernels()
     
     def _initialize_kernels(self):
         """Initialize CUDA kernels for strategies"""
+        # Kernel source and function name per strategy; modules are compiled
+        # on first use for each set of window lengths
         self.kernels = {}
+        self.compiled_kernels = {}
+        self.kernel_lock = threading.Lock()
         
         if not CUDA_AVAILABLE:
             return
         
-        # Moving Average Crossover kernel
-        self.kernels["MovingAverageCrossover"] = SourceModule(get_cuda_kernel("moving_average")).get_function("moving_avg_crossover")
-        
-        # Bollinger Bands kernel
-        self.kernels["BollingerBands"] = SourceModule(get_cuda_kernel("bollinger_bands")).get_function("bollinger_bands")
-        
-        # Momentum kernel
-        self.kernels["MomentumStrategy"] = SourceModule(get_cuda_kernel("momentum")).get_function("momentum_strategy")
-        
-        # Mean Reversion kernel
-        self.kernels["MeanReversion"] = SourceModule(get_cuda_kernel("mean_reversion")).get_function("mean_reversion")
+        self.kernels["MovingAverageCrossover"] = ("moving_average", "moving_avg_crossover")
+        self.kernels["BollingerBands"] = ("bollinger_bands", "bollinger_bands")
+        self.kernels["MomentumStrategy"] = ("momentum", "momentum_strategy")
+        self.kernels["MeanReversion"] = ("mean_reversion", "mean_reversion")
     
-    def __del__(self):
-        """Clean up resources"""
-        if hasattr(self, 'cuda_context') and self.cuda_context:
-            self.cuda_context.pop()
+    def _get_kernel(self, strategy_name: str, half_precision: bool = False, **windows: int):
+        """
+        Get a strategy kernel specialized for the given window lengths,
+        passed to nvcc as defines (short_window=20 -> -DSHORT_WINDOW=20).
+        With half_precision the kernel reads FP16 close prices.
+        Cubins are cached on disk by source, options, architecture and nvcc
+        version, so nvcc only runs for combinations no worker has built yet.
+        """
+        key = (strategy_name, half_precision, tuple(sorted(windows.items())))
+        
+        with self.kernel_lock:
+            if key not in self.compiled_kernels:
+                kernel_name, function_name = self.kernels[strategy_name]
+                options = [f"-D{name.upper()}={value}" for name, value in windows.items()]
+                if half_precision:
+                    options.append("-DHALF_PRICES")
+                # The kernels declare their own C linkage, since cuda_fp16.h
+                # cannot be included inside an extern "C" block
+                module = SourceModule(
+                    get_cuda_kernel(kernel_name),
+                    options=options,
+                    no_extern_c=True,
+                    cache_dir=str(config.KERNEL_CACHE_DIR)
+                )
+                self.compiled_kernels[key] = module.get_function(function_name)
+            
+            return self.compiled_kernels[key]
     
     def get_status(self) -> Dict[str, Any]:
         """
@@ -168,9 +274,13 @@ class GPUBacktestEngine:
             "queued_jobs": self.job_queue.qsize()
         }
         
-        if CUDA_AVAILABLE and hasattr(self, 'cuda_device'):
+        if CUDA_AVAILABLE and self.cuda_context:
             # Add GPU-specific information
-            free_mem, total_mem = cuda.mem_get_info()
+            self.cuda_context.push()
+            try:
+                free_mem, total_mem = cuda.mem_get_info()
+            finally:
+                cuda.Context.pop()
             status.update({
                 "device_name": self.cuda_device.name(),
                 "compute_capability": self.cuda_device.compute_capability(),
@@ -193,6 +303,7 @@ class GPUBacktestEngine:
         """
         # Generate a unique job ID
         job_id = str(uuid.uuid4())
+        created_at = datetime.utcnow()
         
         # Create database record
         session = Session()
@@ -201,7 +312,8 @@ class GPUBacktestEngine:
                 id=job_id,
                 user_id=request.user_id,
                 request=request.dict(),
-                status=JobStatus.PENDING.value
+                status=JobStatus.PENDING.value,
+                created_at=created_at
             )
             session.add(record)
             session.commit()
@@ -214,6 +326,7 @@ class GPUBacktestEngine:
         
         # Add to job queue with priority
         logger.info(f"Adding job {job_id} to queue with priority {request.priority}")
+        self.job_created[job_id] = created_at
         self.job_queue.put((request.priority, job_id, request))
         
         return job_id
@@ -232,6 +345,16 @@ class GPUBacktestEngine:
         if job_id in self.job_results:
             return self.job_results[job_id]
         
+        # Jobs running on this worker can no longer be cancelled, so their
+        # status is known without a query
+        created_at = self.job_created.get(job_id)
+        if created_at is not None and job_id in self.active_jobs:
+            return JobStatusResponse(
+                job_id=job_id,
+                status=JobStatus.RUNNING,
+                created_at=created_at
+            )
+        
         # Query database
         session = Session()
         try:
@@ -275,22 +398,30 @@ class GPUBacktestEngine:
             # Can't cancel currently running jobs
             return False
         
-        # Update database
+        # Update database. Only a pending job can be cancelled, and the
+        # status check is part of the UPDATE so a worker on another process
+        # claiming the job at the same time either sees the cancellation or
+        # wins, never both
         session = Session()
         try:
-            record = session.query(BacktestRecord).filter_by(id=job_id).first()
-            
-            if not record:
-                raise ValueError(f"Job {job_id} not found")
-            
-            if record.status in [JobStatus.PENDING.value, JobStatus.RUNNING.value]:
-                record.status = JobStatus.CANCELLED.value
-                session.commit()
-                return True
-            else:
+            with session.begin():
+                updated = session.execute(
+                    update(BacktestRecord)
+                    .where(
+                        BacktestRecord.id == job_id,
+                        BacktestRecord.status == JobStatus.PENDING.value
+                    )
+                    .values(status=JobStatus.CANCELLED.value)
+                ).rowcount
+                
+                if updated:
+                    return True
+                
+                if session.get(BacktestRecord, job_id) is None:
+                    raise ValueError(f"Job {job_id} not found")
+                
                 return False
         except Exception as e:
-            session.rollback()
             logger.error(f"Error cancelling job: {str(e)}")
             raise
         finally:
@@ -303,6 +434,12 @@ class GPUBacktestEngine:
         Returns:
             List of strategy objects
         """
+        return list(self.strategies)
+    
+    def _build_strategies(self) -> List[Strategy]:
+        """
+        Build the strategy descriptions; they are fixed, so this runs once
+        """
         strategies = []
         
         # Moving Average Crossover
@@ -399,94 +536,101 @@ class GPUBacktestEngine:
         """
         logger.info("Starting job processing thread")
         
+        # Kernels run on this thread, so it needs the worker's context
+        if self.cuda_context:
+            self.cuda_context.push()
+        
         while True:
             try:
                 # Get job from queue
                 _, job_id, request = self.job_queue.get()
                 
-                # Skip cancelled jobs
-                session = Session()
-                try:
-                    record = session.query(BacktestRecord).filter_by(id=job_id).first()
-                    if record.status == JobStatus.CANCELLED.value:
-                        logger.info(f"Skipping cancelled job {job_id}")
-                        self.job_queue.task_done()
-                        continue
-                finally:
-                    session.close()
-                
-                # Add to active jobs
-                self.active_jobs[job_id] = request
-                
-                # Update status in database
-                session = Session()
-                try:
-                    record = session.query(BacktestRecord).filter_by(id=job_id).first()
-                    record.status = JobStatus.RUNNING.value
-                    session.commit()
-                except Exception as e:
-                    session.rollback()
-                    logger.error(f"Error updating job status: {str(e)}")
-                finally:
-                    session.close()
-                
-                # Process job
-                logger.info(f"Processing job {job_id}")
-                try:
-                    start_time = time.time()
-                    result = self._run_backtest(request)
-                    execution_time = time.time() - start_time
+                # One session per job, with a short transaction per status
+                # change; the connection goes back to the pool in between
+                with Session() as session:
+                    created_at = self.job_created[job_id]
                     
-                    # Update database with result
-                    session = Session()
+                    # Mark the job running unless it was cancelled while
+                    # queued, checking and updating in one statement
                     try:
-                        record = session.query(BacktestRecord).filter_by(id=job_id).first()
-                        record.status = JobStatus.COMPLETED.value
-                        record.execution_time = execution_time
-                        record.results = result.dict()
-                        session.commit()
-                        
-                        # Store result in memory
-                        self.job_results[job_id] = JobStatusResponse(
-                            job_id=job_id,
-                            status=JobStatus.COMPLETED,
-                            created_at=record.created_at,
-                            execution_time=execution_time,
-                            results=result
-                        )
+                        with session.begin():
+                            updated = session.execute(
+                                update(BacktestRecord)
+                                .where(
+                                    BacktestRecord.id == job_id,
+                                    BacktestRecord.status != JobStatus.CANCELLED.value
+                                )
+                                .values(status=JobStatus.RUNNING.value)
+                            ).rowcount
                         
-                        logger.info(f"Job {job_id} completed in {execution_time:.2f} seconds")
+                        if not updated:
+                            logger.info(f"Skipping cancelled job {job_id}")
+                            del self.job_created[job_id]
+                            self.job_queue.task_done()
+                            continue
                     except Exception as e:
-                        session.rollback()
-                        logger.error(f"Error saving job result: {str(e)}")
-                    finally:
-                        session.close()
-                except Exception as e:
-                    logger.error(f"Error processing job {job_id}: {str(e)}", exc_info=True)
+                        logger.error(f"Error updating job status: {str(e)}")
                     
-                    # Update database with error
-                    session = Session()
+                    # Add to active jobs
+                    self.active_jobs[job_id] = request
+                    
+                    # Process job
+                    logger.info(f"Processing job {job_id}")
                     try:
-                        record = session.query(BacktestRecord).filter_by(id=job_id).first()
-                        record.status = JobStatus.FAILED.value
-                        record.error = str(e)
-                        session.commit()
+                        start_time = time.time()
+                        result = self._run_backtest(request)
+                        execution_time = time.time() - start_time
                         
-                        # Store error in memory
-                        self.job_results[job_id] = JobStatusResponse(
-                            job_id=job_id,
-                            status=JobStatus.FAILED,
-                            created_at=record.created_at,
-                            error=str(e)
-                        )
-                    except Exception as e2:
-                        session.rollback()
-                        logger.error(f"Error saving job error: {str(e2)}")
-                    finally:
-                        session.close()
+                        # Update database with result
+                        try:
+                            with session.begin():
+                                session.execute(
+                                    update(BacktestRecord)
+                                    .where(BacktestRecord.id == job_id)
+                                    .values(
+                                        status=JobStatus.COMPLETED.value,
+                                        execution_time=execution_time,
+                                        results=result.dict()
+                                    )
+                                )
+                            
+                            # Store result in memory
+                            self.job_results[job_id] = JobStatusResponse(
+                                job_id=job_id,
+                                status=JobStatus.COMPLETED,
+                                created_at=created_at,
+                                execution_time=execution_time,
+                                results=result
+                            )
+                            
+                            logger.info(f"Job {job_id} completed in {execution_time:.2f} seconds")
+                        except Exception as e:
+                            logger.error(f"Error saving job result: {str(e)}")
+                    except Exception as e:
+                        logger.error(f"Error processing job {job_id}: {str(e)}", exc_info=True)
+                        
+                        # Update database with error
+                        try:
+                            with session.begin():
+                                session.execute(
+                                    update(BacktestRecord)
+                                    .where(BacktestRecord.id == job_id)
+                                    .values(status=JobStatus.FAILED.value, error=str(e))
+                                )
+                            
+                            # Store error in memory
+                            self.job_results[job_id] = JobStatusResponse(
+                                job_id=job_id,
+                                status=JobStatus.FAILED,
+                                created_at=created_at,
+                                error=str(e)
+                            )
+                        except Exception as e2:
+                            logger.error(f"Error saving job error: {str(e2)}")
                 
                 # Remove from active jobs
                 del self.active_jobs[job_id]
+                del self.job_created[job_id]
                 
                 # Mark task as done
                 self.job_queue.task_done()
@@ -519,7 +663,7 @@ class GPUBacktestEngine:
             raise ValueError("No data available for the specified symbols and date range")
         
         # Check if strategy is supported
-        if request.strategy.name not in [s.id for s in self.list_strategies()]:
+        if request.strategy.name not in self.strategy_ids:
             raise ValueError(f"Strategy {request.strategy.name} not supported")
         
         # Prepare data for GPU processing
@@ -532,54 +676,71 @@ class GPUBacktestEngine:
                 logger.warning(f"Missing columns for {symbol}: {missing_columns}")
                 continue
             
-            # Convert to numpy array
-            if 'volume' in df.columns:
-                gpu_data[symbol] = df[['open', 'high', 'low', 'close', 'volume']].values
-            else:
-                # Add volume column with zeros if not present
-                ohlc = df[['open', 'high', 'low', 'close']].values
-                volume = np.zeros((len(ohlc), 1))
-                gpu_data[symbol] = np.hstack((ohlc, volume))
+            # Convert to a float32 array in column-major order, so each column
+            # (the close in particular) is contiguous and the prices, already
+            # float32, are copied once without casting
+            ohlcv = np.empty((len(df), 5), dtype=np.float32, order='F')
+            for i, column in enumerate(required_columns):
+                ohlcv[:, i] = df[column].to_numpy()
+            
+            # Volume is zero if not present
+            ohlcv[:, 4] = df['volume'].to_numpy() if 'volume' in df.columns else 0
+            gpu_data[symbol] = ohlcv
+        
+        # Run strategy on GPU for all symbols in a single launch
+        if CUDA_AVAILABLE and request.strategy.name in self.kernels:
+            strategy_outputs = self._execute_batch_on_gpu(
+                gpu_data,
+                request.strategy.name,
+                request.strategy.parameters,
+                request.execution.half_precision
+            )
+        else:
+            # Otherwise each symbol runs on its own, side by side on the
+            # thread pool; the compiled CPU strategies release the GIL
+            def symbol_strategy(symbol):
+                return self._execute_strategy(
+                    gpu_data[symbol],
+                    request.strategy.name,
+                    request.strategy.parameters
+                )
+            
+            symbols = list(gpu_data)
+            strategy_outputs = dict(zip(symbols, self.executor.map(symbol_strategy, symbols)))
         
-        # Run strategy on GPU
-        position_arrays = {}
+        # Store positions for metrics calculation
+        position_arrays = {symbol: positions for symbol, (_, positions) in strategy_outputs.items()}
         equity_curves = {}
         trades_list = []
         
-        for symbol, ohlcv in gpu_data.items():
-            # Execute strategy on GPU
-            signals, positions = self._execute_strategy(
-                ohlcv, 
-                request.strategy.name,
-                request.strategy.parameters
+        def symbol_results(symbol):
+            # Walk the positions once for both the round trips and the
+            # equity curve
+            legs, equity = _trade_legs_and_equity(
+                position_arrays[symbol],
+                gpu_data[symbol][:, 3],  # close prices
+                request.execution.initial_capital / len(gpu_data),
+                request.execution.commission,
+                request.execution.slippage
             )
             
-            # Store positions for metrics calculation
-            position_arrays[symbol] = positions
-            
             # Generate trades
             trades = self._generate_trades(
                 symbol,
                 data[symbol].index.values,
-                ohlcv,
-                positions,
+                legs,
                 request.execution.initial_capital,
                 request.execution.position_size,
-                request.execution.commission,
-                request.execution.slippage
+                request.execution.commission
             )
             
+            return trades, equity
+        
+        # Symbols are independent; the compiled loops release the GIL, so
+        # they run side by side on the engine's otherwise idle thread pool
+        symbols = list(gpu_data)
+        for symbol, (trades, equity) in zip(symbols, self.executor.map(symbol_results, symbols)):
             trades_list.extend(trades)
-            
-            # Calculate equity curve
-            prices = ohlcv[:, 3]  # close prices
-            equity = self._calculate_equity_curve(
-                positions,
-                prices,
-                request.execution.initial_capital / len(gpu_data),
-                request.execution.commission,
-                request.execution.slippage
-            )
             equity_curves[symbol] = equity
         
         # Calculate metrics
@@ -597,8 +758,10 @@ class GPUBacktestEngine:
             # Use uniform length for all equity curves
             min_length = min(len(curve) for curve in equity_curves.values())
             
-            # Sum up equity curves
-            combined_equity = sum(curve[:min_length] for curve in equity_curves.values())
+            # Sum up equity curves into one buffer
+            combined_equity = np.zeros(min_length)
+            for curve in equity_curves.values():
+                np.add(combined_equity, curve[:min_length], out=combined_equity)
         
         # Prepare results
         result = BacktestResult(
@@ -650,26 +813,129 @@ class GPUBacktestEngine:
         """
         Execute strategy on GPU using PyCUDA
         """
-        n_bars = ohlcv.shape[0]
+        return self._execute_batch_on_gpu({"": ohlcv}, strategy_name, parameters)[""]
+    
+    def _execute_batch_on_gpu(
+        self,
+        gpu_data: Dict[str, np.ndarray],
+        strategy_name: str,
+        parameters: Dict[str, Any],
+        half_precision: bool = False
+    ) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Execute strategy on GPU for several symbols with one kernel launch.
+        With half_precision the close prices are uploaded as FP16, which
+        halves the transfer and the kernels' reads; the kernels still
+        compute in FP32, but signals near a threshold may differ.
+        """
+        offsets = np.concatenate(([0], np.cumsum([len(ohlcv) for ohlcv in gpu_data.values()]))).astype(np.int32)
+        total_bars = int(offsets[-1])
+        max_bars = int(np.diff(offsets).max(initial=0))
+        
+        # Prices past the FP16 range would turn into infinities
+        if half_precision and max_bars > 0:
+            max_close = max(float(np.abs(ohlcv[:, 3]).max(initial=0)) for ohlcv in gpu_data.values())
+            if not max_close <= np.finfo(np.float16).max:
+                logger.warning(f"Close prices up to {max_close} do not fit in FP16, using FP32")
+                half_precision = False
+        
+        # Page-locked host buffers holding all symbols back to back, which
+        # go back to the pool once the results are copied out; only mean
+        # reversion marks the bars where it closes a position
+        h_close = self.pinned_pool.allocate((total_bars,), np.float16 if half_precision else np.float32)
+        h_signals = self.pinned_pool.allocate((total_bars,), np.int8)
+        h_exits = self.pinned_pool.allocate((total_bars,), np.int8) if strategy_name == "MeanReversion" else None
+        
+        for i, ohlcv in enumerate(gpu_data.values()):
+            h_close[offsets[i]:offsets[i + 1]] = ohlcv[:, 3]
+        
+        if max_bars > 0:
+            # Keep the device buffers alive until the stream is drained
+            in_flight = self._launch_on_gpu(
+                h_close,
+                offsets,
+                max_bars,
+                h_signals,
+                h_exits,
+                strategy_name,
+                parameters,
+                self.stream,
+                half_precision
+            )
+            self.stream.synchronize()
+            del in_flight
         
-        # Allocate memory on GPU
-        d_ohlcv = cuda.mem_alloc(ohlcv.nbytes)
-        d_signals = cuda.mem_alloc(n_bars * 4)  # float32
-        d_positions = cuda.mem_alloc(n_bars * 4)  # float32
+        positions = self._fill_positions(h_signals, offsets, h_exits)
         
-        # Initialize output arrays
-        h_signals = np.zeros(n_bars, dtype=np.float32)
-        h_positions = np.zeros(n_bars, dtype=np.float32)
+        return {
+            symbol: (h_signals[offsets[i]:offsets[i + 1]].copy(), positions[offsets[i]:offsets[i + 1]])
+            for i, symbol in enumerate(gpu_data)
+        }
+    
+    def _fill_positions(
+        self,
+        signals: np.ndarray,
+        offsets: np.ndarray,
+        exits: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Positions for signals laid out back to back: each bar holds the last
+        non-zero signal of its symbol, or 0 before the first one or after an
+        exit bar. This is a forward fill done with one running max over the
+        bar indices the position is taken from.
+        """
+        n_bars = len(signals)
+        
+        # A symbol's first bar stops earlier symbols carrying over
+        is_source = signals != 0
+        is_source[offsets[:-1][np.diff(offsets) > 0]] = True
+        if exits is not None:
+            is_source |= exits.astype(bool)
+        
+        sources = np.where(is_source, np.arange(n_bars), 0)
+        np.maximum.accumulate(sources, out=sources)
+        
+        # Exit bars carry no signal, so they and the bars after them read 0
+        return signals[sources]
+    
+    def _launch_on_gpu(
+        self,
+        h_close: np.ndarray,
+        offsets: np.ndarray,
+        max_bars: int,
+        h_signals: np.ndarray,
+        h_exits: Optional[np.ndarray],
+        strategy_name: str,
+        parameters: Dict[str, Any],
+        stream: "cuda.Stream",
+        half_precision: bool = False
+    ) -> Tuple[Any, ...]:
+        """
+        Queue the upload, kernel and download for a batch of symbols laid
+        out back to back, with offsets[i] the first bar of symbol i. The
+        host arrays must be page-locked; the returned device buffers must
+        stay alive until the stream is synchronized. h_exits receives the
+        exit marks of strategies that close positions without a signal.
+        h_close is float16 when half_precision is set.
+        """
+        n_symbols = len(offsets) - 1
+        
+        # Allocate memory on GPU from the pool; blocks return to it when
+        # the caller drops them
+        d_close = self.device_pool.allocate(h_close.nbytes)
+        d_offsets = self.device_pool.allocate(offsets.nbytes)
+        d_signals = self.device_pool.allocate(h_signals.nbytes)  # int8
+        d_exits = self.device_pool.allocate(h_exits.nbytes) if h_exits is not None else None  # int8
         
         # Copy data to GPU
-        cuda.memcpy_htod(d_ohlcv, ohlcv.astype(np.float32))
+        cuda.memcpy_htod_async(d_close, h_close, stream)
+        cuda.memcpy_htod_async(d_offsets, offsets, stream)
         
-        # Set up grid and block dimensions
+        # Set up grid and block dimensions, one row of blocks per symbol.
+        # Windowed kernels run one thread per tile of TILE_BARS bars and
+        # size their blocks for the prices they stage
         block_size = 256
-        grid_size = (n_bars + block_size - 1) // block_size
-        
-        # Get kernel function
-        kernel_func = self.kernels[strategy_name]
+        grid_size = (max_bars + block_size - 1) // block_size
         
         # Call appropriate kernel with parameters
         if strategy_name == "MovingAverageCrossover":
@@ -677,67 +943,74 @@ class GPUBacktestEngine:
             long_window = int(parameters.get("long_window", 50))
             signal_threshold = float(parameters.get("signal_threshold", 0.01))
             
+            kernel_func = self._get_kernel(strategy_name, half_precision, short_window=short_window, long_window=long_window)
+            tile_block, tile_grid, shared = _tile_launch(max_bars, max(short_window, long_window))
             kernel_func(
-                d_ohlcv,
-                np.int32(n_bars),
-                np.int32(short_window),
-                np.int32(long_window),
+                d_close,
+                d_offsets,
                 np.float32(signal_threshold),
                 d_signals,
-                d_positions,
-                block=(block_size, 1, 1),
-                grid=(grid_size, 1)
+                block=(tile_block, 1, 1),
+                grid=(tile_grid, n_symbols),
+                shared=shared,
+                stream=stream
             )
         elif strategy_name == "BollingerBands":
             window = int(parameters.get("window", 20))
             num_std = float(parameters.get("num_std", 2.0))
             
+            kernel_func = self._get_kernel(strategy_name, half_precision, window=window)
+            tile_block, tile_grid, shared = _tile_launch(max_bars, window)
             kernel_func(
-                d_ohlcv,
-                np.int32(n_bars),
-                np.int32(window),
+                d_close,
+                d_offsets,
                 np.float32(num_std),
                 d_signals,
-                d_positions,
-                block=(block_size, 1, 1),
-                grid=(grid_size, 1)
+                block=(tile_block, 1, 1),
+                grid=(tile_grid, n_symbols),
+                shared=shared,
+                stream=stream
             )
         elif strategy_name == "MomentumStrategy":
             window = int(parameters.get("window", 14))
             threshold = float(parameters.get("threshold", 0.0))
             
+            kernel_func = self._get_kernel(strategy_name, half_precision, window=window)
             kernel_func(
-                d_ohlcv,
-                np.int32(n_bars),
-                np.int32(window),
+                d_close,
+                d_offsets,
                 np.float32(threshold),
                 d_signals,
-                d_positions,
                 block=(block_size, 1, 1),
-                grid=(grid_size, 1)
+                grid=(grid_size, n_symbols),
+                stream=stream
             )
         elif strategy_name == "MeanReversion":
             window = int(parameters.get("window", 20))
             entry_threshold = float(parameters.get("entry_threshold", 1.5))
             exit_threshold = float(parameters.get("exit_threshold", 0.5))
             
+            kernel_func = self._get_kernel(strategy_name, half_precision, window=window)
+            tile_block, tile_grid, shared = _tile_launch(max_bars, window)
             kernel_func(
-                d_ohlcv,
-                np.int32(n_bars),
-                np.int32(window),
+                d_close,
+                d_offsets,
                 np.float32(entry_threshold),
                 np.float32(exit_threshold),
                 d_signals,
-                d_positions,
-                block=(block_size, 1, 1),
-                grid=(grid_size, 1)
+                d_exits,
+                block=(tile_block, 1, 1),
+                grid=(tile_grid, n_symbols),
+                shared=shared,
+                stream=stream
             )
         
         # Copy results back from GPU
-        cuda.memcpy_dtoh(h_signals, d_signals)
-        cuda.memcpy_dtoh(h_positions, d_positions)
+        cuda.memcpy_dtoh_async(h_signals, d_signals, stream)
+        if h_exits is not None:
+            cuda.memcpy_dtoh_async(h_exits, d_exits, stream)
         
-        return h_signals, h_positions
+        return d_close, d_offsets, d_signals, d_exits
     
     def _execute_on_cupy(
         self,
@@ -749,17 +1022,18 @@ class GPUBacktestEngine:
         Execute strategy on GPU using CuPy
         """
         import cupy as cp
+        import cupyx
         
-        # Transfer data to GPU
-        d_ohlcv = cp.array(ohlcv, dtype=cp.float32)
-        n_bars = len(d_ohlcv)
+        # Transfer the close prices to GPU; the strategies read nothing else.
+        # Staging them in pinned memory from CuPy's pool lets the copy go
+        # straight to DMA instead of through a temporary pinned buffer
+        h_close = cupyx.empty_pinned(len(ohlcv), dtype=np.float32)
+        h_close[:] = ohlcv[:, 3]
+        close = cp.asarray(h_close)
+        n_bars = len(close)
         
-        # Initialize output arrays
+        # Initialize output array
         d_signals = cp.zeros(n_bars, dtype=cp.float32)
-        d_positions = cp.zeros(n_bars, dtype=cp.float32)
-        
-        # Extract close prices
-        close = d_ohlcv[:, 3]
         
         # Execute strategy logic
         if strategy_name == "MovingAverageCrossover":
@@ -767,14 +1041,9 @@ class GPUBacktestEngine:
             long_window = int(parameters.get("long_window", 50))
             signal_threshold = float(parameters.get("signal_threshold", 0.01))
             
-            # Calculate moving averages
-            short_ma = cp.convolve(close, cp.ones(short_window)/short_window, mode='valid')
-            long_ma = cp.convolve(close, cp.ones(long_window)/long_window, mode='valid')
-            
-            # Pad shorter array to match lengths
-            pad_length = max(short_window, long_window) - 1
-            short_ma = cp.pad(short_ma, (pad_length, 0), 'constant', constant_values=cp.nan)
-            long_ma = cp.pad(long_ma, (pad_length, 0), 'constant', constant_values=cp.nan)
+            # Calculate moving averages, aligned with the bars they end on
+            short_ma = self._rolling_mean(close, short_window)
+            long_ma = self._rolling_mean(close, long_window)
             
             # Generate signals when short MA crosses above/below long MA
             d_signals[long_window:] = cp.sign(short_ma[long_window:] - long_ma[long_window:])
@@ -786,49 +1055,29 @@ class GPUBacktestEngine:
             window = int(parameters.get("window", 20))
             num_std = float(parameters.get("num_std", 2.0))
             
-            # Calculate moving average and standard deviation
-            ma = cp.convolve(close, cp.ones(window)/window, mode='valid')
-            ma = cp.pad(ma, (window-1, 0), 'constant', constant_values=cp.nan)
-            
-            # Calculate rolling standard deviation
-            rolled = cp.lib.stride_tricks.as_strided(
-                close,
-                shape=(len(close) - window + 1, window),
-                strides=(close.itemsize, close.itemsize)
-            )
-            std = cp.std(rolled, axis=1)
-            std = cp.pad(std, (window-1, 0), 'constant', constant_values=cp.nan)
-            
-            # Calculate Bollinger Bands
-            upper_band = ma + num_std * std
-            lower_band = ma - num_std * std
-            
-            # Generate signals
-            d_signals = cp.zeros_like(close)
-            d_signals[window:] = cp.where(
-                close[window:] < lower_band[window:], 1,  # Buy signal
-                cp.where(
-                    close[window:] > upper_band[window:], -1,  # Sell signal
-                    0
+            # The fused kernel slides the window sums along tiles of bars and
+            # writes signals directly, without materializing the bands
+            kernel_func = _get_cupy_kernel("bollinger_bands", "bollinger_bands", (f"-DWINDOW={window}",))
+            offsets = cp.array([0, n_bars], dtype=cp.int32)
+            signals = cp.zeros(n_bars, dtype=cp.int8)
+            if n_bars > 0:
+                tile_block, tile_grid, shared = _tile_launch(n_bars, window)
+                kernel_func(
+                    (tile_grid, 1),
+                    (tile_block,),
+                    (close, offsets, cp.float32(num_std), signals),
+                    shared_mem=shared
                 )
-            )
+            d_signals = signals.astype(cp.float32)
             
         elif strategy_name == "MomentumStrategy":
             window = int(parameters.get("window", 14))
             threshold = float(parameters.get("threshold", 0.0))
             
-            # Calculate momentum (close price change over window)
-            momentum = cp.zeros_like(close)
-            momentum[window:] = close[window:] / close[:-window] - 1
-            
-            # Generate signals based on momentum and threshold
-            d_signals = cp.where(
-                momentum > threshold, 1,  # Buy signal
-                cp.where(
-                    momentum < -threshold, -1,  # Sell signal
-                    0
-                )
-            )
+            # Buy above the momentum threshold and sell below its negative,
+            # from the first bar with a full window as in the CUDA kernel
+            if n_bars > window:
+                _momentum_signals(close[window:], close[:-window], cp.float32(threshold), d_signals[window:])
             
         elif strategy_name == "MeanReversion":
             window = int(parameters.get("window", 20))
@@ -836,17 +1085,7 @@ class GPUBacktestEngine:
             exit_threshold = float(parameters.get("exit_threshold", 0.5))
             
             # Calculate moving average and standard deviation
-            ma = cp.convolve(close, cp.ones(window)/window, mode='valid')
-            ma = cp.pad(ma, (window-1, 0), 'constant', constant_values=cp.nan)
-            
-            # Calculate rolling standard deviation
-            rolled = cp.lib.stride_tricks.as_strided(
-                close,
-                shape=(len(close) - window + 1, window),
-                strides=(close.itemsize, close.itemsize)
-            )
-            std = cp.std(rolled, axis=1)
-            std = cp.pad(std, (window-1, 0), 'constant', constant_values=cp.nan)
+            ma, std = self._rolling_moments(close, window)
             
             # Calculate z-score (deviation from mean in terms of standard deviations)
             z_score = (close - ma) / std
@@ -870,12 +1109,12 @@ class GPUBacktestEngine:
             cp.maximum.accumulate(indices, out=indices)
             d_signals = cp.where(mask, d_signals[indices], d_signals)
         
-        # Convert signals to positions (cumulative signal)
-        for i in range(1, n_bars):
-            if d_signals[i] != 0:
-                d_positions[i] = d_signals[i]
-            else:
-                d_positions[i] = d_positions[i-1]
+        # Convert signals to positions: from the second bar on, each bar
+        # holds the last non-zero signal, found with a running max over the
+        # bar indices instead of a loop that syncs on every element
+        indices = cp.where(d_signals != 0, cp.arange(n_bars), 0)
+        cp.maximum.accumulate(indices, out=indices)
+        d_positions = cp.where(indices > 0, d_signals[indices], cp.float32(0))
         
         # Transfer results back to CPU
         h_signals = cp.asnumpy(d_signals)
@@ -883,6 +1122,34 @@ class GPUBacktestEngine:
         
         return h_signals, h_positions
     
+    def _rolling_mean(self, values, window: int):
+        """
+        Rolling mean of a CuPy array over window bars from differences of
+        its running sum, NaN for the first window - 1 bars
+        """
+        import cupy as cp
+        
+        # Sum in float64 so long series keep the precision of each window
+        csum = cp.concatenate((cp.zeros(1), cp.cumsum(values, dtype=cp.float64)))
+        
+        mean = cp.full(len(values), cp.nan)
+        if len(values) >= window:
+            mean[window - 1:] = (csum[window:] - csum[:-window]) / window
+        return mean
+    
+    def _rolling_moments(self, close, window: int):
+        """
+        Rolling mean and population standard deviation of a CuPy array,
+        with the variance taken as E[x^2] - E[x]^2
+        """
+        import cupy as cp
+        
+        ma = self._rolling_mean(close, window)
+        var = self._rolling_mean(close.astype(cp.float64) ** 2, window) - ma ** 2
+        
+        # Cancellation can leave a flat window slightly negative
+        return ma, cp.sqrt(cp.maximum(var, 0))
+    
     def _execute_on_cpu(
         self,
         ohlcv: np.ndarray,
@@ -892,136 +1159,49 @@ class GPUBacktestEngine:
         """
         Execute strategy on CPU (fallback)
         """
-        # Convert to pandas DataFrame for easier calculations
-        df = pd.DataFrame(
-            ohlcv,
-            columns=['open', 'high', 'low', 'close', 'volume']
-        )
-        
-        n_bars = len(df)
-        signals = np.zeros(n_bars)
-        positions = np.zeros(n_bars)
+        close = ohlcv[:, 3]
         
         if strategy_name == "MovingAverageCrossover":
             short_window = int(parameters.get("short_window", 20))
             long_window = int(parameters.get("long_window", 50))
             signal_threshold = float(parameters.get("signal_threshold", 0.01))
             
-            # Calculate moving averages
-            df['short_ma'] = df['close'].rolling(window=short_window).mean()
-            df['long_ma'] = df['close'].rolling(window=long_window).mean()
-            
-            # Generate signals
-            previous_position = 0
-            for i in range(long_window, n_bars):
-                if df['short_ma'].iloc[i] > df['long_ma'].iloc[i] and \
-                   abs(df['short_ma'].iloc[i] - df['long_ma'].iloc[i]) > signal_threshold * df['close'].iloc[i]:
-                    signals[i] = 1  # Buy signal
-                    positions[i] = 1
-                elif df['short_ma'].iloc[i] < df['long_ma'].iloc[i] and \
-                     abs(df['short_ma'].iloc[i] - df['long_ma'].iloc[i]) > signal_threshold * df['close'].iloc[i]:
-                    signals[i] = -1  # Sell signal
-                    positions[i] = -1
-                else:
-                    signals[i] = 0
-                    positions[i] = previous_position
-                previous_position = positions[i]
+            return _ma_crossover_signals(close, short_window, long_window, signal_threshold)
         
         elif strategy_name == "BollingerBands":
             window = int(parameters.get("window", 20))
             num_std = float(parameters.get("num_std", 2.0))
             
-            # Calculate Bollinger Bands
-            df['ma'] = df['close'].rolling(window=window).mean()
-            df['std'] = df['close'].rolling(window=window).std()
-            df['upper'] = df['ma'] + num_std * df['std']
-            df['lower'] = df['ma'] - num_std * df['std']
-            
-            # Generate signals
-            previous_position = 0
-            for i in range(window, n_bars):
-                if df['close'].iloc[i] < df['lower'].iloc[i]:
-                    signals[i] = 1  # Buy signal
-                    positions[i] = 1
-                elif df['close'].iloc[i] > df['upper'].iloc[i]:
-                    signals[i] = -1  # Sell signal
-                    positions[i] = -1
-                else:
-                    signals[i] = 0
-                    positions[i] = previous_position
-                previous_position = positions[i]
+            return _bollinger_signals(close, window, num_std)
         
         elif strategy_name == "MomentumStrategy":
             window = int(parameters.get("window", 14))
             threshold = float(parameters.get("threshold", 0.0))
             
-            # Calculate momentum
-            df['momentum'] = df['close'].pct_change(periods=window)
-            
-            # Generate signals
-            previous_position = 0
-            for i in range(window, n_bars):
-                if df['momentum'].iloc[i] > threshold:
-                    signals[i] = 1  # Buy signal
-                    positions[i] = 1
-                elif df['momentum'].iloc[i] < -threshold:
-                    signals[i] = -1  # Sell signal
-                    positions[i] = -1
-                else:
-                    signals[i] = 0
-                    positions[i] = previous_position
-                previous_position = positions[i]
+            return _momentum_signals_cpu(close, window, threshold)
         
         elif strategy_name == "MeanReversion":
             window = int(parameters.get("window", 20))
             entry_threshold = float(parameters.get("entry_threshold", 1.5))
             exit_threshold = float(parameters.get("exit_threshold", 0.5))
             
-            # Calculate z-score
-            df['ma'] = df['close'].rolling(window=window).mean()
-            df['std'] = df['close'].rolling(window=window).std()
-            df['z_score'] = (df['close'] - df['ma']) / df['std']
-            
-            # Generate signals
-            previous_position = 0
-            for i in range(window, n_bars):
-                z = df['z_score'].iloc[i]
-                if z < -entry_threshold:
-                    signals[i] = 1  # Buy signal
-                    positions[i] = 1
-                elif z > entry_threshold:
-                    signals[i] = -1  # Sell signal
-                    positions[i] = -1
-                elif abs(z) < exit_threshold:
-                    signals[i] = 0  # Exit signal
-                    positions[i] = 0
-                else:
-                    signals[i] = 0
-                    positions[i] = previous_position
-                previous_position = positions[i]
+            return _mean_reversion_signals(close, window, entry_threshold, exit_threshold)
         
-        return signals, positions
+        # Unknown strategies never take a position
+        return np.zeros(len(ohlcv)), np.zeros(len(ohlcv))
     
     def _generate_trades(
         self,
         symbol: str,
         dates: np.ndarray,
-        ohlcv: np.ndarray,
-        positions: np.ndarray,
+        legs: Tuple[np.ndarray, ...],
         initial_capital: float,
         position_size_spec: str,
-        commission: float,
-        slippage: float
+        commission: float
     ) -> List[Trade]:
         """
-        Generate trade records from position signals
+        Generate trade records from the round trips of a position series
         """
-        trades = []
-        position_size = 0
-        entry_price = 0
-        entry_date = None
-        current_position = 0
-        
         # Determine position size
         if position_size_spec.endswith("%"):
             # Percentage of capital
@@ -1031,141 +1211,332 @@ class GPUBacktestEngine:
             # Fixed dollar amount
             position_size = float(position_size_spec)
         
-        for i in range(1, len(positions)):
-            if positions[i] != positions[i-1]:
-                # Position changed
-                new_position = positions[i]
-                
-                # Close existing position if any
-                if current_position != 0:
-                    # Calculate exit price with slippage
-                    exit_price = ohlcv[i, 3]  # close price
-                    if current_position > 0:
-                        exit_price = exit_price * (1 - slippage)  # selling, so lower price
-                    else:
-                        exit_price = exit_price * (1 + slippage)  # buying to cover, so higher price
-                    
-                    # Calculate shares and P&L
-                    shares = position_size / abs(entry_price)
-                    pnl = shares * (exit_price - entry_price) * np.sign(current_position)
-                    
-                    # Subtract commission
-                    pnl -= commission * position_size
-                    
-                    # Create trade record
-                    trade = Trade(
-                        symbol=symbol,
-                        entry_date=entry_date.astype('datetime64[D]').astype(str),
-                        exit_date=dates[i].astype('datetime64[D]').astype(str),
-                        entry_price=float(entry_price),
-                        exit_price=float(exit_price),
-                        position_size=float(position_size * np.sign(current_position)),
-                        pnl=float(pnl)
-                    )
-                    trades.append(trade)
-                
-                # Enter new position if not zero
-                if new_position != 0:
-                    # Calculate entry price with slippage
-                    entry_price = ohlcv[i, 3]  # close price
-                    if new_position > 0:
-                        entry_price = entry_price * (1 + slippage)  # buying, so higher price
-                    else:
-                        entry_price = entry_price * (1 - slippage)  # selling short, so lower price
-                    
-                    entry_date = dates[i]
-                    current_position = new_position
-                else:
-                    current_position = 0
-        
-        # Close any open position at the end
-        if current_position != 0:
-            # Use last price as exit
-            exit_price = ohlcv[-1, 3]
-            if current_position > 0:
-                exit_price = exit_price * (1 - slippage)
-            else:
-                exit_price = exit_price * (1 + slippage)
-            
-            shares = position_size / abs(entry_price)
-            pnl = shares * (exit_price - entry_price) * np.sign(current_position)
-            pnl -= commission * position_size
-            
-            trade = Trade(
+        # Price all the round trips at once
+        entry_bars, exit_bars, entry_prices, exit_prices, directions = legs
+        
+        shares = position_size / np.abs(entry_prices)
+        pnls = shares * (exit_prices - entry_prices) * directions
+        pnls -= commission * position_size
+        
+        entry_dates = dates[entry_bars].astype('datetime64[D]').astype(str)
+        exit_dates = dates[exit_bars].astype('datetime64[D]').astype(str)
+        
+        return [
+            Trade(
                 symbol=symbol,
-                entry_date=entry_date.astype('datetime64[D]').astype(str),
-                exit_date=dates[-1].astype('datetime64[D]').astype(str),
-                entry_price=float(entry_price),
-                exit_price=float(exit_price),
-                position_size=float(position_size * np.sign(current_position)),
-                pnl=float(pnl)
+                entry_date=entry_dates[k],
+                exit_date=exit_dates[k],
+                entry_price=float(entry_prices[k]),
+                exit_price=float(exit_prices[k]),
+                position_size=float(position_size * directions[k]),
+                pnl=float(pnls[k])
             )
-            trades.append(trade)
-        
-        return trades
+            for k in range(len(pnls))
+        ]
+
+
+def _trade_legs_and_equity(positions, close, initial_capital, commission, slippage):
+    """
+    Round trips and equity curve of a position series in one walk over the
+    positions and close prices. The round trips are given as entry and exit
+    bars, prices after slippage and directions; a position still open at the
+    end exits on the last bar. Equity trades 10% of itself on entry and
+    marks an open position to market from the equity it was entered with.
+    Prices are widened to float64 before any arithmetic.
+    """
+    n_bars = len(positions)
+    entry_bars = np.empty(n_bars, dtype=np.int64)
+    exit_bars = np.empty(n_bars, dtype=np.int64)
+    entry_prices = np.empty(n_bars)
+    exit_prices = np.empty(n_bars)
+    directions = np.empty(n_bars)
+    n_trades = 0
     
-    def _calculate_equity_curve(
-        self,
-        positions: np.ndarray,
-        prices: np.ndarray,
-        initial_capital: float,
-        commission: float,
-        slippage: float
-    ) -> np.ndarray:
-        """
-        Calculate equity curve from positions and prices
-        """
-        equity = np.zeros(len(positions))
-        equity[0] = initial_capital
-        position = 0
-        entry_price = 0
-        shares = 0
-        
-        for i in range(1, len(positions)):
-            # Check if position changed
-            if positions[i] != positions[i-1]:
-                # Calculate exit price for old position
-                if position != 0:
-                    exit_price = prices[i]
-                    if position > 0:
-                        exit_price = exit_price * (1 - slippage)  # selling, so lower price
-                    else:
-                        exit_price = exit_price * (1 + slippage)  # buying to cover, so higher price
-                    
-                    # Calculate P&L
-                    pnl = shares * (exit_price - entry_price) * np.sign(position)
-                    
-                    # Subtract commission
-                    pnl -= commission * (shares * abs(entry_price))
-                    
-                    # Update equity
-                    equity[i] = equity[i-1] + pnl
+    equity = np.zeros(n_bars)
+    equity[0] = initial_capital
+    
+    current_position = 0.0
+    entry_bar = 0
+    entry_price = 0.0
+    shares = 0.0
+    entry_equity = 0.0
+    
+    for i in range(1, n_bars):
+        if positions[i] != positions[i-1]:
+            # Close existing position if any
+            if current_position != 0:
+                if current_position > 0:
+                    exit_price = float(close[i]) * (1 - slippage)  # selling, so lower price
                 else:
-                    equity[i] = equity[i-1]
+                    exit_price = float(close[i]) * (1 + slippage)  # buying to cover, so higher price
                 
-                # Enter new position
-                position = positions[i]
-                if position != 0:
-                    # Calculate entry price
-                    entry_price = prices[i]
-                    if position > 0:
-                        entry_price = entry_price * (1 + slippage)  # buying, so higher price
-                    else:
-                        entry_price = entry_price * (1 - slippage)  # selling short, so lower price
-                    
-                    # Calculate shares (use fixed percentage of capital)
-                    position_size = 0.1 * equity[i]  # 10% of capital
-                    shares = position_size / abs(entry_price)
-                    
-                    # Subtract commission
-                    equity[i] -= commission * position_size
+                entry_bars[n_trades] = entry_bar
+                exit_bars[n_trades] = i
+                entry_prices[n_trades] = entry_price
+                exit_prices[n_trades] = exit_price
+                directions[n_trades] = np.sign(current_position)
+                n_trades += 1
+                
+                # Realize P&L less commission on the entry value
+                pnl = shares * (exit_price - entry_price) * np.sign(current_position)
+                pnl -= commission * (shares * abs(entry_price))
+                equity[i] = entry_equity + pnl
             else:
-                # Position unchanged, calculate unrealized P&L
-                if position != 0:
-                    current_price = prices[i]
-                    unrealized_pnl = shares * (current_price - entry_price) * np.sign(position)
-                    equity[i] = equity[i-1] + (unrealized_pnl - equity[i-1] * (position != 0))
+                equity[i] = equity[i-1]
+            
+            # Enter new position if not zero
+            new_position = positions[i]
+            if new_position != 0:
+                if new_position > 0:
+                    entry_price = float(close[i]) * (1 + slippage)  # buying, so higher price
                 else:
-                    equity[i] = equity[i-1]
+                    entry_price = float(close[i]) * (1 - slippage)  # selling short, so lower price
+                
+                entry_bar = i
+                current_position = new_position
+                
+                # Size the position at 10% of equity and pay commission on it
+                position_size = 0.1 * equity[i]
+                shares = position_size / abs(entry_price)
+                equity[i] -= commission * position_size
+                entry_equity = equity[i]
+            else:
+                current_position = 0.0
+        else:
+            # Position unchanged, add its unrealized P&L to the equity at entry
+            if current_position != 0:
+                unrealized_pnl = shares * (float(close[i]) - entry_price) * np.sign(current_position)
+                equity[i] = entry_equity + unrealized_pnl
+            else:
+                equity[i] = equity[i-1]
+    
+    # Close any open position at the end
+    if current_position != 0:
+        if current_position > 0:
+            exit_price = float(close[n_bars - 1]) * (1 - slippage)
+        else:
+            exit_price = float(close[n_bars - 1]) * (1 + slippage)
+        
+        entry_bars[n_trades] = entry_bar
+        exit_bars[n_trades] = n_bars - 1
+        entry_prices[n_trades] = entry_price
+        exit_prices[n_trades] = exit_price
+        directions[n_trades] = np.sign(current_position)
+        n_trades += 1
+    
+    legs = (
+        entry_bars[:n_trades],
+        exit_bars[:n_trades],
+        entry_prices[:n_trades],
+        exit_prices[:n_trades],
+        directions[:n_trades]
+    )
+    return legs, equity
+
+
+def _sliding_mean(close, window):
+    """
+    Rolling mean over window bars, NaN before the first full window. The
+    window sum slides one bar at a time with compensated additions, and a
+    window of identical prices averages to exactly that price, as in pandas.
+    """
+    n_bars = len(close)
+    ma = np.full(n_bars, np.nan)
+    total = 0.0
+    compensation = 0.0
+    same_count = 0
+    
+    for i in range(n_bars):
+        value = float(close[i])
+        
+        # Add the new bar and drop the one leaving the window
+        y = value - compensation
+        t = total + y
+        compensation = (t - total) - y
+        total = t
+        if i >= window:
+            y = -float(close[i - window]) - compensation
+            t = total + y
+            compensation = (t - total) - y
+            total = t
+        
+        if i > 0 and value == float(close[i - 1]):
+            same_count += 1
+        else:
+            same_count = 1
         
-        return equity
\ No newline at end of file
+        if i >= window - 1:
+            ma[i] = value if same_count >= window else total / window
+    
+    return ma
+
+
+def _sliding_mean_std(close, window):
+    """
+    Rolling mean and sample standard deviation over window bars, NaN before
+    the first full window. Welford's updates slide the window one bar at a
+    time; a window of identical prices has exactly zero deviation.
+    """
+    n_bars = len(close)
+    ma = np.full(n_bars, np.nan)
+    std = np.full(n_bars, np.nan)
+    mean = 0.0
+    ssqdm = 0.0  # sum of squared deviations from the mean
+    same_count = 0
+    
+    for i in range(n_bars):
+        value = float(close[i])
+        
+        if i < window:
+            # Grow the first window
+            delta = value - mean
+            mean += delta / (i + 1)
+            ssqdm += delta * (value - mean)
+        else:
+            # Replace the bar leaving the window with the new one
+            dropped = float(close[i - window])
+            new_mean = mean + (value - dropped) / window
+            ssqdm += (value - dropped) * (value - new_mean + dropped - mean)
+            mean = new_mean
+        
+        if i > 0 and value == float(close[i - 1]):
+            same_count += 1
+        else:
+            same_count = 1
+        
+        if i >= window - 1:
+            if same_count >= window:
+                ma[i] = value
+                std[i] = 0.0
+            else:
+                ma[i] = mean
+                if window > 1:
+                    std[i] = np.sqrt(max(ssqdm, 0.0) / (window - 1))
+    
+    return ma, std
+
+
+def _ma_crossover_signals(close, short_window, long_window, signal_threshold):
+    """
+    Signals and positions of the moving average crossover strategy
+    """
+    n_bars = len(close)
+    signals = np.zeros(n_bars)
+    positions = np.zeros(n_bars)
+    
+    # Calculate moving averages
+    short_ma = _sliding_mean(close, short_window)
+    long_ma = _sliding_mean(close, long_window)
+    
+    # Generate signals
+    previous_position = 0.0
+    for i in range(long_window, n_bars):
+        price = float(close[i])
+        if short_ma[i] > long_ma[i] and abs(short_ma[i] - long_ma[i]) > signal_threshold * price:
+            signals[i] = 1  # Buy signal
+            positions[i] = 1
+        elif short_ma[i] < long_ma[i] and abs(short_ma[i] - long_ma[i]) > signal_threshold * price:
+            signals[i] = -1  # Sell signal
+            positions[i] = -1
+        else:
+            positions[i] = previous_position
+        previous_position = positions[i]
+    
+    return signals, positions
+
+
+def _bollinger_signals(close, window, num_std):
+    """
+    Signals and positions of the Bollinger Bands strategy
+    """
+    n_bars = len(close)
+    signals = np.zeros(n_bars)
+    positions = np.zeros(n_bars)
+    
+    # Calculate Bollinger Bands
+    ma, std = _sliding_mean_std(close, window)
+    
+    # Generate signals
+    previous_position = 0.0
+    for i in range(window, n_bars):
+        price = float(close[i])
+        if price < ma[i] - num_std * std[i]:
+            signals[i] = 1  # Buy signal
+            positions[i] = 1
+        elif price > ma[i] + num_std * std[i]:
+            signals[i] = -1  # Sell signal
+            positions[i] = -1
+        else:
+            positions[i] = previous_position
+        previous_position = positions[i]
+    
+    return signals, positions
+
+
+def _momentum_signals_cpu(close, window, threshold):
+    """
+    Signals and positions of the momentum strategy
+    """
+    n_bars = len(close)
+    signals = np.zeros(n_bars)
+    positions = np.zeros(n_bars)
+    
+    # Generate signals from the percent change over the window
+    previous_position = 0.0
+    for i in range(window, n_bars):
+        momentum = close[i] / close[i - window] - 1
+        if momentum > threshold:
+            signals[i] = 1  # Buy signal
+            positions[i] = 1
+        elif momentum < -threshold:
+            signals[i] = -1  # Sell signal
+            positions[i] = -1
+        else:
+            positions[i] = previous_position
+        previous_position = positions[i]
+    
+    return signals, positions
+
+
+def _mean_reversion_signals(close, window, entry_threshold, exit_threshold):
+    """
+    Signals and positions of the mean reversion strategy
+    """
+    n_bars = len(close)
+    signals = np.zeros(n_bars)
+    positions = np.zeros(n_bars)
+    
+    # Calculate moving average and standard deviation
+    ma, std = _sliding_mean_std(close, window)
+    
+    # Generate signals from the z-score
+    previous_position = 0.0
+    for i in range(window, n_bars):
+        z = (float(close[i]) - ma[i]) / std[i]
+        if z < -entry_threshold:
+            signals[i] = 1  # Buy signal
+            positions[i] = 1
+        elif z > entry_threshold:
+            signals[i] = -1  # Sell signal
+            positions[i] = -1
+        elif abs(z) < exit_threshold:
+            positions[i] = 0  # Exit signal
+        else:
+            positions[i] = previous_position
+        previous_position = positions[i]
+    
+    return signals, positions
+
+
+if NUMBA_AVAILABLE:
+    # The per-bar loops compile to machine code that runs without the GIL;
+    # the Python versions above remain the fallback. Strategies divide by
+    # prices and deviations that can be zero, which gives inf or NaN as in
+    # NumPy rather than raising
+    _trade_legs_and_equity = njit(cache=True, nogil=True)(_trade_legs_and_equity)
+    _sliding_mean = njit(cache=True, nogil=True)(_sliding_mean)
+    _sliding_mean_std = njit(cache=True, nogil=True)(_sliding_mean_std)
+    _ma_crossover_signals = njit(cache=True, nogil=True)(_ma_crossover_signals)
+    _bollinger_signals = njit(cache=True, nogil=True)(_bollinger_signals)
+    _momentum_signals_cpu = njit(cache=True, nogil=True, error_model='numpy')(_momentum_signals_cpu)
+    _mean_reversion_signals = njit(cache=True, nogil=True, error_model='numpy')(_mean_reversion_signals)
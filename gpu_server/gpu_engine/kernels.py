@@ -5,10 +5,47 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Bars per thread in the windowed kernels, which slide their window sums
+# along a tile of consecutive bars rather than re-summing each window. The
+# tiles are staged in shared memory; an odd length puts the tiles of
+# neighbouring threads in different banks
+TILE_BARS = 33
+
+_TILE_SOURCE = '''
+    #define TILE_BARS %d
+''' % TILE_BARS
+
+# Close prices are float by default, or half with -DHALF_PRICES; either way
+# they are read through load_price and computed on as float
+_PRICE_SOURCE = '''
+    #ifdef HALF_PRICES
+    #include <cuda_fp16.h>
+    typedef __half price_t;
+    __device__ __forceinline__ float load_price(const price_t *p) {
+        return __half2float(__ldg(p));
+    }
+    #else
+    typedef float price_t;
+    __device__ __forceinline__ float load_price(const price_t *p) {
+        return __ldg(p);
+    }
+    #endif
+'''
+
 def get_cuda_kernel(strategy_name: str) -> str:
     """
     Get CUDA kernel code for a specific strategy
     
+    Window lengths are compile-time constants; compile with -DWINDOW=...
+    (moving_average: -DSHORT_WINDOW=... -DLONG_WINDOW=...). The windowed
+    kernels run one thread per TILE_BARS bars of a symbol, momentum one
+    thread per bar. The windowed kernels stage each block's prices, plus the
+    HALO bars before them (the longest window), in dynamic shared memory of
+    (blockDim.x * TILE_BARS + HALO) floats.
+    
+    Kernels only write signals (-1, 0 or 1, as signed chars); positions
+    are derived from them on the host.
+    
     Args:
         strategy_name: Name of the strategy
         
@@ -30,66 +67,90 @@ def _get_moving_average_kernel() -> str:
     """
     CUDA kernel for Moving Average Crossover strategy
     """
-    return '''
+    return _PRICE_SOURCE + _TILE_SOURCE + '''
     #include <stdio.h>
     
-    __global__ void moving_avg_crossover(
-        float *ohlcv,
-        int n_bars,
-        int short_window,
-        int long_window,
+    #define HALO (SHORT_WINDOW > LONG_WINDOW ? SHORT_WINDOW : LONG_WINDOW)
+    
+    extern "C" __global__ void moving_avg_crossover(
+        const price_t * __restrict__ close,
+        const int * __restrict__ offsets,
         float signal_threshold,
-        float *signals,
-        float *positions
+        signed char * __restrict__ signals
     ) {
-        // Calculate thread index
-        int idx = blockIdx.x * blockDim.x + threadIdx.x;
+        // Prices of the block's bars and of the HALO bars before them
+        extern __shared__ float tile[];
         
-        // Check if thread is within data range
-        if (idx >= n_bars) {
-            return;
-        }
+        // Each thread handles a tile of consecutive bars, and each block
+        // blockDim.x such tiles
+        int block_first = blockIdx.x * blockDim.x * TILE_BARS;
+        int first = block_first + threadIdx.x * TILE_BARS;
         
-        // Initialize signals and positions to zero
-        signals[idx] = 0.0f;
+        // One row of blocks per symbol; symbols are laid out back to back
+        int start = offsets[blockIdx.y];
+        int n_bars = offsets[blockIdx.y + 1] - start;
         
-        // We need at least long_window bars for the strategy
-        if (idx < long_window) {
-            positions[idx] = 0.0f;
+        // Check if block is within data range
+        if (block_first >= n_bars) {
             return;
         }
         
-        // Calculate short-term moving average
-        float short_ma = 0.0f;
-        for (int i = 0; i < short_window; i++) {
-            short_ma += ohlcv[(idx - short_window + 1 + i) * 5 + 3]; // Close price at index 3
+        close += start;
+        signals += start;
+        
+        // Stage the block's prices in shared memory with coalesced loads;
+        // the halo before the symbol's first bar is never read
+        int tile_start = block_first - HALO;
+        int tile_end = min(block_first + (int)blockDim.x * TILE_BARS, n_bars);
+        for (int bar = tile_start + threadIdx.x; bar < tile_end; bar += blockDim.x) {
+            tile[bar - tile_start] = bar >= 0 ? load_price(&close[bar]) : 0.0f;
         }
-        short_ma /= short_window;
+        __syncthreads();
         
-        // Calculate long-term moving average
-        float long_ma = 0.0f;
-        for (int i = 0; i < long_window; i++) {
-            long_ma += ohlcv[(idx - long_window + 1 + i) * 5 + 3]; // Close price at index 3
+        // Check if thread is within data range
+        if (first >= n_bars) {
+            return;
         }
-        long_ma /= long_window;
+        int last = min(first + TILE_BARS, n_bars);
         
-        // Current close price
-        float close = ohlcv[idx * 5 + 3];
+        // We need at least LONG_WINDOW bars for the strategy
+        int idx = first;
+        for (; idx < last && idx < LONG_WINDOW; idx++) {
+            signals[idx] = 0;
+        }
+        if (idx >= last) {
+            return;
+        }
         
-        // Generate signal based on moving average crossover
-        if (short_ma > long_ma && fabsf(short_ma - long_ma) > signal_threshold * close) {
-            signals[idx] = 1.0f; // Buy signal
-        } else if (short_ma < long_ma && fabsf(short_ma - long_ma) > signal_threshold * close) {
-            signals[idx] = -1.0f; // Sell signal
+        // Sums of the windows ending on the bar before the first one, in
+        // double so sliding them along the tile does not drift
+        double short_sum = 0.0;
+        for (int i = idx - SHORT_WINDOW; i < idx; i++) {
+            short_sum += tile[i - tile_start];
+        }
+        double long_sum = 0.0;
+        for (int i = idx - LONG_WINDOW; i < idx; i++) {
+            long_sum += tile[i - tile_start];
         }
         
-        // Calculate position (1 for long, -1 for short, 0 for no position)
-        if (signals[idx] != 0.0f) {
-            positions[idx] = signals[idx];
-        } else if (idx > 0) {
-            positions[idx] = positions[idx - 1];
-        } else {
-            positions[idx] = 0.0f;
+        for (; idx < last; idx++) {
+            // Current close price
+            float price = tile[idx - tile_start];
+            
+            // Slide both windows forward by one bar
+            short_sum += (double)price - tile[idx - SHORT_WINDOW - tile_start];
+            long_sum += (double)price - tile[idx - LONG_WINDOW - tile_start];
+            float short_ma = (float)(short_sum / SHORT_WINDOW);
+            float long_ma = (float)(long_sum / LONG_WINDOW);
+            
+            // Generate signal based on moving average crossover
+            signed char signal = 0;
+            if (short_ma > long_ma && fabsf(short_ma - long_ma) > signal_threshold * price) {
+                signal = 1; // Buy signal
+            } else if (short_ma < long_ma && fabsf(short_ma - long_ma) > signal_threshold * price) {
+                signal = -1; // Sell signal
+            }
+            signals[idx] = signal;
         }
     }
     '''
@@ -98,72 +159,99 @@ def _get_bollinger_bands_kernel() -> str:
     """
     CUDA kernel for Bollinger Bands strategy
     """
-    return '''
+    return _PRICE_SOURCE + _TILE_SOURCE + '''
     #include <stdio.h>
     #include <math.h>
     
-    __global__ void bollinger_bands(
-        float *ohlcv,
-        int n_bars,
-        int window,
+    #define HALO WINDOW
+    
+    extern "C" __global__ void bollinger_bands(
+        const price_t * __restrict__ close,
+        const int * __restrict__ offsets,
         float num_std,
-        float *signals,
-        float *positions
+        signed char * __restrict__ signals
     ) {
-        // Calculate thread index
-        int idx = blockIdx.x * blockDim.x + threadIdx.x;
+        // Prices of the block's bars and of the HALO bars before them
+        extern __shared__ float tile[];
         
-        // Check if thread is within data range
-        if (idx >= n_bars) {
-            return;
-        }
+        // Each thread handles a tile of consecutive bars, and each block
+        // blockDim.x such tiles
+        int block_first = blockIdx.x * blockDim.x * TILE_BARS;
+        int first = block_first + threadIdx.x * TILE_BARS;
         
-        // Initialize signals and positions to zero
-        signals[idx] = 0.0f;
+        // One row of blocks per symbol; symbols are laid out back to back
+        int start = offsets[blockIdx.y];
+        int n_bars = offsets[blockIdx.y + 1] - start;
         
-        // We need at least window bars for the strategy
-        if (idx < window) {
-            positions[idx] = 0.0f;
+        // Check if block is within data range
+        if (block_first >= n_bars) {
             return;
         }
         
-        // Calculate moving average
-        float ma = 0.0f;
-        for (int i = 0; i < window; i++) {
-            ma += ohlcv[(idx - window + 1 + i) * 5 + 3]; // Close price at index 3
-        }
-        ma /= window;
+        close += start;
+        signals += start;
         
-        // Calculate standard deviation
-        float variance = 0.0f;
-        for (int i = 0; i < window; i++) {
-            float diff = ohlcv[(idx - window + 1 + i) * 5 + 3] - ma;
-            variance += diff * diff;
+        // Stage the block's prices in shared memory with coalesced loads;
+        // the halo before the symbol's first bar is never read
+        int tile_start = block_first - HALO;
+        int tile_end = min(block_first + (int)blockDim.x * TILE_BARS, n_bars);
+        for (int bar = tile_start + threadIdx.x; bar < tile_end; bar += blockDim.x) {
+            tile[bar - tile_start] = bar >= 0 ? load_price(&close[bar]) : 0.0f;
         }
-        variance /= window;
-        float std_dev = sqrtf(variance);
+        __syncthreads();
         
-        // Calculate Bollinger Bands
-        float upper_band = ma + num_std * std_dev;
-        float lower_band = ma - num_std * std_dev;
+        // Check if thread is within data range
+        if (first >= n_bars) {
+            return;
+        }
+        int last = min(first + TILE_BARS, n_bars);
         
-        // Current close price
-        float close = ohlcv[idx * 5 + 3];
+        // We need at least WINDOW bars for the strategy
+        int idx = first;
+        for (; idx < last && idx < WINDOW; idx++) {
+            signals[idx] = 0;
+        }
+        if (idx >= last) {
+            return;
+        }
         
-        // Generate signal based on price crossing Bollinger Bands
-        if (close < lower_band) {
-            signals[idx] = 1.0f; // Buy signal when price crosses below lower band
-        } else if (close > upper_band) {
-            signals[idx] = -1.0f; // Sell signal when price crosses above upper band
+        // Sum and sum of squares of the window ending on the bar before the
+        // first one, in double so sliding them along the tile does not drift
+        double sum = 0.0;
+        double sum_sq = 0.0;
+        for (int i = idx - WINDOW; i < idx; i++) {
+            double value = tile[i - tile_start];
+            sum += value;
+            sum_sq += value * value;
         }
         
-        // Calculate position
-        if (signals[idx] != 0.0f) {
-            positions[idx] = signals[idx];
-        } else if (idx > 0) {
-            positions[idx] = positions[idx - 1];
-        } else {
-            positions[idx] = 0.0f;
+        for (; idx < last; idx++) {
+            // Current close price
+            float price = tile[idx - tile_start];
+            
+            // Slide the window forward by one bar
+            double value = price;
+            double dropped = tile[idx - WINDOW - tile_start];
+            sum += value - dropped;
+            sum_sq += value * value - dropped * dropped;
+            
+            // Moving average and variance of the window
+            double mean = sum / WINDOW;
+            float ma = (float)mean;
+            float std_dev = (float)sqrt(fmax(sum_sq / WINDOW - mean * mean, 0.0));
+            
+            // Calculate Bollinger Bands
+            float upper_band = ma + num_std * std_dev;
+            float lower_band = ma - num_std * std_dev;
+            
+            // Generate signal based on price crossing Bollinger Bands
+            signed char signal = 0;
+            if (price < lower_band) {
+                signal = 1; // Buy signal when price crosses below lower band
+            } else if (price > upper_band) {
+                signal = -1; // Sell signal when price crosses above upper band
+            }
+            signals[idx] = signal;
         }
     }
     '''
@@ -172,53 +260,48 @@ def _get_momentum_kernel() -> str:
     """
     CUDA kernel for Momentum strategy
     """
-    return '''
+    return _PRICE_SOURCE + '''
     #include <stdio.h>
     
-    __global__ void momentum_strategy(
-        float *ohlcv,
-        int n_bars,
-        int window,
+    extern "C" __global__ void momentum_strategy(
+        const price_t * __restrict__ close,
+        const int * __restrict__ offsets,
         float threshold,
-        float *signals,
-        float *positions
+        signed char * __restrict__ signals
     ) {
         // Calculate thread index
         int idx = blockIdx.x * blockDim.x + threadIdx.x;
         
+        // One row of blocks per symbol; symbols are laid out back to back
+        int start = offsets[blockIdx.y];
+        int n_bars = offsets[blockIdx.y + 1] - start;
+        
         // Check if thread is within data range
         if (idx >= n_bars) {
             return;
         }
         
-        // Initialize signals and positions to zero
-        signals[idx] = 0.0f;
+        close += start;
+        signals += start;
+        
+        // Initialize signals to zero
+        signals[idx] = 0;
         
-        // We need at least window bars for the strategy
-        if (idx < window) {
-            positions[idx] = 0.0f;
+        // We need at least WINDOW bars for the strategy
+        if (idx < WINDOW) {
             return;
         }
         
-        // Calculate momentum (percent change over window)
-        float past_price = ohlcv[(idx - window) * 5 + 3]; // Close price at index 3
-        float current_price = ohlcv[idx * 5 + 3];
+        // Calculate momentum (percent change over the window)
+        float past_price = load_price(&close[idx - WINDOW]);
+        float current_price = load_price(&close[idx]);
         float momentum = (current_price / past_price) - 1.0f;
         
         // Generate signal based on momentum
         if (momentum > threshold) {
-            signals[idx] = 1.0f; // Buy signal
+            signals[idx] = 1; // Buy signal
         } else if (momentum < -threshold) {
-            signals[idx] = -1.0f; // Sell signal
-        }
-        
-        // Calculate position
-        if (signals[idx] != 0.0f) {
-            positions[idx] = signals[idx];
-        } else if (idx > 0) {
-            positions[idx] = positions[idx - 1];
-        } else {
-            positions[idx] = 0.0f;
+            signals[idx] = -1; // Sell signal
         }
     }
     '''
@@ -227,74 +310,106 @@ def _get_mean_reversion_kernel() -> str:
     """
     CUDA kernel for Mean Reversion strategy
     """
-    return '''
+    return _PRICE_SOURCE + _TILE_SOURCE + '''
     #include <stdio.h>
     #include <math.h>
     
-    __global__ void mean_reversion(
-        float *ohlcv,
-        int n_bars,
-        int window,
+    #define HALO WINDOW
+    
+    extern "C" __global__ void mean_reversion(
+        const price_t * __restrict__ close,
+        const int * __restrict__ offsets,
         float entry_threshold,
         float exit_threshold,
-        float *signals,
-        float *positions
+        signed char * __restrict__ signals,
+        signed char * __restrict__ exits
     ) {
-        // Calculate thread index
-        int idx = blockIdx.x * blockDim.x + threadIdx.x;
+        // Prices of the block's bars and of the HALO bars before them
+        extern __shared__ float tile[];
         
-        // Check if thread is within data range
-        if (idx >= n_bars) {
+        // Each thread handles a tile of consecutive bars, and each block
+        // blockDim.x such tiles
+        int block_first = blockIdx.x * blockDim.x * TILE_BARS;
+        int first = block_first + threadIdx.x * TILE_BARS;
+        
+        // One row of blocks per symbol; symbols are laid out back to back
+        int start = offsets[blockIdx.y];
+        int n_bars = offsets[blockIdx.y + 1] - start;
+        
+        // Check if block is within data range
+        if (block_first >= n_bars) {
             return;
         }
         
-        // Initialize signals and positions to zero
-        signals[idx] = 0.0f;
+        close += start;
+        signals += start;
+        exits += start;
         
-        // We need at least window bars for the strategy
-        if (idx < window) {
-            positions[idx] = 0.0f;
-            return;
+        // Stage the block's prices in shared memory with coalesced loads;
+        // the halo before the symbol's first bar is never read
+        int tile_start = block_first - HALO;
+        int tile_end = min(block_first + (int)blockDim.x * TILE_BARS, n_bars);
+        for (int bar = tile_start + threadIdx.x; bar < tile_end; bar += blockDim.x) {
+            tile[bar - tile_start] = bar >= 0 ? load_price(&close[bar]) : 0.0f;
         }
+        __syncthreads();
         
-        // Calculate moving average
-        float ma = 0.0f;
-        for (int i = 0; i < window; i++) {
-            ma += ohlcv[(idx - window + 1 + i) * 5 + 3]; // Close price at index 3
+        // Check if thread is within data range
+        if (first >= n_bars) {
+            return;
         }
-        ma /= window;
+        int last = min(first + TILE_BARS, n_bars);
         
-        // Calculate standard deviation
-        float variance = 0.0f;
-        for (int i = 0; i < window; i++) {
-            float diff = ohlcv[(idx - window + 1 + i) * 5 + 3] - ma;
-            variance += diff * diff;
+        // We need at least WINDOW bars for the strategy
+        int idx = first;
+        for (; idx < last && idx < WINDOW; idx++) {
+            signals[idx] = 0;
+            exits[idx] = 0;
+        }
+        if (idx >= last) {
+            return;
         }
-        variance /= window;
-        float std_dev = sqrtf(variance);
-        
-        // Current close price
-        float close = ohlcv[idx * 5 + 3];
-        
-        // Calculate z-score (deviation from mean in terms of standard deviations)
-        float z_score = (close - ma) / std_dev;
-        
-        // Generate signal based on z-score
-        if (z_score < -entry_threshold) {
-            signals[idx] = 1.0f; // Buy signal when price is significantly below mean
-        } else if (z_score > entry_threshold) {
-            signals[idx] = -1.0f; // Sell signal when price is significantly above mean
-        } else if (fabsf(z_score) < exit_threshold) {
-            signals[idx] = 0.0f; // Exit signal when price returns close to mean
+        
+        // Sum and sum of squares of the window ending on the bar before the
+        // first one, in double so sliding them along the tile does not drift
+        double sum = 0.0;
+        double sum_sq = 0.0;
+        for (int i = idx - WINDOW; i < idx; i++) {
+            double value = tile[i - tile_start];
+            sum += value;
+            sum_sq += value * value;
         }
         
-        // Calculate position
-        if (signals[idx] != 0.0f) {
-            positions[idx] = signals[idx];
-        } else if (idx > 0 && fabsf(z_score) >= exit_threshold) {
-            positions[idx] = positions[idx - 1]; // Maintain position
-        } else {
-            positions[idx] = 0.0f; // No position
+        for (; idx < last; idx++) {
+            // Current close price
+            float price = tile[idx - tile_start];
+            
+            // Slide the window forward by one bar
+            double value = price;
+            double dropped = tile[idx - WINDOW - tile_start];
+            sum += value - dropped;
+            sum_sq += value * value - dropped * dropped;
+            
+            // Moving average and standard deviation of the window
+            double mean = sum / WINDOW;
+            float ma = (float)mean;
+            float std_dev = (float)sqrt(fmax(sum_sq / WINDOW - mean * mean, 0.0));
+            
+            // Calculate z-score (deviation from mean in terms of standard deviations)
+            float z_score = (price - ma) / std_dev;
+            
+            // Generate signal based on z-score
+            signed char signal = 0;
+            if (z_score < -entry_threshold) {
+                signal = 1; // Buy signal when price is significantly below mean
+            } else if (z_score > entry_threshold) {
+                signal = -1; // Sell signal when price is significantly above mean
+            }
+            signals[idx] = signal;
+            
+            // Mark bars that close the position: no new signal and the price is
+            // back near the mean. Positions are filled in from these on the host
+            exits[idx] = signal == 0 && !(fabsf(z_score) >= exit_threshold);
         }
     }
-    '''
\ No newline at end of file
+    '''
@@ -0,0 +1,16 @@
+"""
+Gunicorn configuration for the GPU server
+"""
+import config
+
+bind = f"{config.HOST}:{config.PORT}"
+
+# Each worker process builds its own GPUBacktestEngine and CUDA context;
+# request threads only do CPU-side work and hand jobs to the engine
+workers = config.WORKERS
+worker_class = "gthread"
+threads = config.WORKER_THREADS
+
+# CUDA cannot be initialized before the fork, so the app must be loaded
+# in each worker rather than in the master
+preload_app = False
@@ -40,6 +40,7 @@ class ExecutionConfig(BaseModel):
     position_size: str = "10%"  # Can be percentage or fixed amount
     commission: float = 0.0
     slippage: float = 0.0
+    half_precision: bool = False  # FP16 prices on the GPU; faster sweeps, not bit-reproducible
 
 class OutputConfig(BaseModel):
     """Output configuration for backtest"""
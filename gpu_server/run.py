@@ -2,6 +2,7 @@
 Entry point script for the GPU server
 """
 import os
+import sys
 import logging
 from dotenv import load_dotenv
 
@@ -14,14 +15,12 @@ logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 
-# Import app after loading environment variables
-from app import app
-
 if __name__ == "__main__":
-    # Get host and port from environment or use defaults
-    host = os.environ.get("GPU_SERVER_HOST", "0.0.0.0")
-    port = int(os.environ.get("GPU_SERVER_PORT", 5050))
-    debug = os.environ.get("GPU_SERVER_DEBUG", "True").lower() in ("true", "1", "t", "yes")
-    
-    # Start the server
-    app.run(host=host, port=port, debug=debug)
\ No newline at end of file
+    # Serve with Gunicorn. The app is imported by each worker after the fork,
+    # so every worker creates its own CUDA context. Gunicorn resolves app:app
+    # and the config file's imports from the working directory, so run from
+    # the server's own directory wherever the script was started
+    server_dir = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(server_dir)
+    config_file = os.path.join(server_dir, "gunicorn.conf.py")
+    os.execv(sys.executable, [sys.executable, "-m", "gunicorn", "--config", config_file, "app:app"])
\ No newline at end of file
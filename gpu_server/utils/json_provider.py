@@ -0,0 +1,21 @@
+"""
+JSON serialization for the GPU server
+"""
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson. NumPy arrays and scalars are
+    serialized natively; anything orjson doesn't know falls back to
+    Flask's default conversions.
+    """
+    
+    options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    
+    def dumps(self, obj, **kwargs) -> str:
+        # Formatting arguments (indent, sort_keys) are ignored
+        return orjson.dumps(obj, default=self.default, option=self.options).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
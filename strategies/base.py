@@ -1,6 +1,9 @@
 from abc import ABC, abstractmethod
 import numpy as np
-from typing import Dict, Tuple, Any
+import pycuda.driver as cuda
+import pycuda.gpuarray as gpuarray
+from typing import Dict, Tuple, Any, Optional
+from engine.validation import close_price_dtype
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,13 +23,36 @@ class BaseStrategy(ABC):
         self.name = name
     
     @abstractmethod
+    def launch_on_gpu(
+        self, 
+        d_close: gpuarray.GPUArray, 
+        d_offsets: gpuarray.GPUArray,
+        max_bars: int,
+        parameters: Dict[str, Any],
+        stream: Optional[cuda.Stream] = None
+    ) -> Tuple[gpuarray.GPUArray, gpuarray.GPUArray]:
+        """
+        Launch the strategy kernel for a batch of symbols without waiting for it to finish
+        
+        Args:
+            d_close: Close prices of all symbols, back to back, on the GPU (float16, or float32 beyond the FP16 range)
+            d_offsets: Start index of each symbol in d_close [n_symbols + 1] (int32)
+            max_bars: Number of bars of the longest symbol
+            parameters: Strategy parameters dictionary
+            stream: CUDA stream to launch on (default stream if None)
+            
+        Returns:
+            Tuple of (signals, positions) as float16 GPU arrays
+        """
+        pass
+    
     def execute_on_gpu(
         self, 
         ohlcv: np.ndarray, 
         parameters: Dict[str, Any]
     ) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Execute the strategy on GPU
+        Execute the strategy on GPU and wait for the results
         
         Args:
             ohlcv: OHLCV data as numpy array [n_bars, 5]
@@ -35,7 +61,13 @@ class BaseStrategy(ABC):
         Returns:
             Tuple of (signals, positions) as numpy arrays
         """
-        pass
+        n_bars = ohlcv.shape[0]
+        close = ohlcv[:, 3]  # Use close prices
+        d_close = gpuarray.to_gpu(close.astype(close_price_dtype(close)))
+        d_offsets = gpuarray.to_gpu(np.array([0, n_bars], dtype=np.int32))
+        d_signals, d_positions = self.launch_on_gpu(d_close, d_offsets, n_bars, parameters)
+        
+        return d_signals.get().astype(np.float32), d_positions.get().astype(np.float32)
 
 # Strategy registry
 STRATEGY_REGISTRY = {}
@@ -2,9 +2,9 @@ import numpy as np
 import pandas as pd
 import pycuda.driver as cuda
 import pycuda.gpuarray as gpuarray
-from typing import Dict, Tuple, Any
+from typing import Dict, Tuple, Any, Optional
 from strategies.base import BaseStrategy
-from engine.cuda_kernels import bollinger_bands_kernel
+from engine.cuda_kernels import get_kernel_function, window_prefix_sums
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,22 +22,28 @@ class BollingerBands(BaseStrategy):
         Initialize the strategy
         """
         super().__init__("BollingerBands")
-        self.kernel_func = bollinger_bands_kernel.get_function("bollinger_bands")
+        self.kernel_funcs, self.fill_positions = get_kernel_function(self.name)
     
-    def execute_on_gpu(
+    def launch_on_gpu(
         self, 
-        ohlcv: np.ndarray, 
-        parameters: Dict[str, Any]
-    ) -> Tuple[np.ndarray, np.ndarray]:
+        d_close: gpuarray.GPUArray, 
+        d_offsets: gpuarray.GPUArray,
+        max_bars: int,
+        parameters: Dict[str, Any],
+        stream: Optional[cuda.Stream] = None
+    ) -> Tuple[gpuarray.GPUArray, gpuarray.GPUArray]:
         """
-        Execute the strategy on GPU
+        Launch the strategy kernel for a batch of symbols without waiting for it to finish
         
         Args:
-            ohlcv: OHLCV data as numpy array [n_bars, 5]
+            d_close: Close prices of all symbols, back to back, on the GPU (float16, or float32 beyond the FP16 range)
+            d_offsets: Start index of each symbol in d_close [n_symbols + 1] (int32)
+            max_bars: Number of bars of the longest symbol
             parameters: Strategy parameters dictionary
+            stream: CUDA stream to launch on (default stream if None)
             
         Returns:
-            Tuple of (signals, positions) as numpy arrays
+            Tuple of (signals, positions) as float16 GPU arrays
         """
         # Extract parameters with defaults
         window = int(parameters.get('window', 20))
@@ -49,38 +55,36 @@ class BollingerBands(BaseStrategy):
         if num_std <= 0:
             raise ValueError("num_std must be positive")
         
-        # Prepare data for GPU
-        n_bars = ohlcv.shape[0]
-        close_prices = ohlcv[:, 3].astype(np.float32)  # Use close prices
+        # Allocate output array (the kernel initializes every element)
+        d_signals = gpuarray.empty(d_close.size, dtype=np.float16)
         
-        # Allocate GPU arrays
-        d_ohlcv = gpuarray.to_gpu(close_prices)
-        d_signals = gpuarray.zeros(n_bars, dtype=np.float32)
-        d_positions = gpuarray.zeros(n_bars, dtype=np.float32)
+        # Window sums and sums of squares come from prefix sums
+        d_csum, d_csum_sq = window_prefix_sums(d_close, stream=stream)
         
-        # Set up grid and block dimensions
+        # Set up grid and block dimensions, one row of blocks per symbol
         block_size = 256
-        grid_size = (n_bars + block_size - 1) // block_size
+        grid_size = (max_bars + block_size - 1) // block_size
+        n_symbols = d_offsets.size - 1
         
         # Execute kernel
         try:
-            self.kernel_func(
-                d_ohlcv.gpudata,
-                np.int32(n_bars),
+            self.kernel_funcs[d_close.dtype](
+                d_close.gpudata,
+                d_offsets.gpudata,
+                d_csum.gpudata,
+                d_csum_sq.gpudata,
                 np.int32(window),
                 np.float32(num_std),
                 d_signals.gpudata,
-                d_positions.gpudata,
                 block=(block_size, 1, 1),
-                grid=(grid_size, 1)
+                grid=(grid_size, n_symbols),
+                stream=stream
             )
-            
-            # Transfer results back to CPU
-            signals = d_signals.get()
-            positions = d_positions.get()
-            
-            return signals, positions
-            
         except Exception as e:
             logger.error(f"Error executing BollingerBands strategy on GPU: {str(e)}")
             raise RuntimeError(f"GPU execution failed: {str(e)}")
+        
+        # Positions carry the last signal forward, which is a scan across bars
+        d_positions = self.fill_positions(d_signals, d_offsets, max_bars, stream=stream)
+        
+        return d_signals, d_positions